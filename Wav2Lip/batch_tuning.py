@@ -0,0 +1,191 @@
+import os
+import json
+import socket
+import tempfile
+import threading
+import torch
+
+try:
+	import psutil
+except ImportError: # Optional: without it only measured throughput and OOMs bound the batch size
+	psutil = None
+
+try:
+	import fcntl
+except ImportError: # Not on Windows: saves from concurrent processes are then not serialized
+	fcntl = None
+
+DEFAULT_PROFILE = os.getenv('WAV2LIP_BATCH_PROFILE',
+							os.path.join(os.path.expanduser('~'), '.cache', 'wav2lip', 'batch_profile.json'))
+
+# Fraction of free RAM / GPU memory a job's batches may take
+MEMORY_FRACTION = float(os.getenv('WAV2LIP_BATCH_MEMORY_FRACTION', 0.5))
+
+# Rough peak memory per frame: S3FD float32 activations per input pixel, and the
+# generator's activations per sample plus the full-resolution frames kept for paste-back,
+# which runs one batch behind inference
+DETECT_BYTES_PER_PIXEL = 1000
+GENERATE_BYTES_PER_SAMPLE = 16 * 1024 * 1024
+GENERATE_FRAME_COPIES = 3
+
+def generate_frame_copies(stage_queue_size=0):
+	"""Batches of full-resolution frames alive at once for a pipeline's stage_queue_size.
+
+	Threaded batch and inference stages each hold one batch and queue
+	stage_queue_size more, on top of the batches paste-back keeps.
+	"""
+	if stage_queue_size <= 0:
+		return GENERATE_FRAME_COPIES
+	return GENERATE_FRAME_COPIES + 2 * stage_queue_size + 1
+
+START_SIZES = {'detect': 16, 'generate': 128}
+MAX_SIZES = {'detect': 64, 'generate': 512}
+
+def is_oom(error):
+	"""Whether error is the device (or host) running out of memory, as opposed to any other failure."""
+	if isinstance(error, MemoryError):
+		return True
+	oom_error = getattr(torch.cuda, 'OutOfMemoryError', None)
+	if oom_error is not None and isinstance(error, oom_error):
+		return True
+	message = str(error).lower()
+	return 'out of memory' in message or "can't allocate memory" in message
+
+def free_memory(device):
+	"""Bytes the next batch can use on device, or None if unknown."""
+	if str(device).startswith('cuda') and torch.cuda.is_available():
+		return torch.cuda.mem_get_info()[0]
+	if psutil is not None:
+		return psutil.virtual_memory().available
+	return None
+
+def memory_cap(stage, frame_shape, device, frame_copies=GENERATE_FRAME_COPIES):
+	"""Largest batch size for stage on frames of frame_shape that fits the memory budget."""
+	height, width = frame_shape[:2]
+	if stage == 'detect':
+		per_frame = height * width * DETECT_BYTES_PER_PIXEL
+	else:
+		per_frame = GENERATE_BYTES_PER_SAMPLE + frame_copies * height * width * 3
+	free = free_memory(device)
+	if free is None:
+		return MAX_SIZES[stage]
+	return max(1, min(MAX_SIZES[stage], int(free * MEMORY_FRACTION // per_frame)))
+
+class BatchTuner:
+	"""Picks face detection and generator batch sizes per host, device and resolution.
+
+	A batch size is bounded by the free-memory budget and by the largest size
+	known to fit (sizes that hit OOM are never suggested again). Within that
+	bound the size with the best measured frames/sec wins; while the best one
+	is also the largest tried, the next job tries double. Measurements are
+	kept in a JSON profile shared by every process on the host, so later jobs
+	start at the right size; save() merges this process's measurements into
+	whatever other processes have saved since. frame_copies is how many generator batches of
+	full-resolution frames the pipeline keeps alive (see generate_frame_copies).
+	"""
+
+	def __init__(self, device, path=DEFAULT_PROFILE, frame_copies=GENERATE_FRAME_COPIES):
+		self.device = str(device)
+		self.path = path
+		self.frame_copies = frame_copies
+		self.host = socket.gethostname()
+		self.lock = threading.Lock()
+		self.profile = self._read()
+		# key -> batch sizes whose rate this process measured since the last save
+		self.updated = {}
+
+	def _read(self):
+		try:
+			with open(self.path) as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return {}
+
+	def _key(self, stage, frame_shape):
+		return '{}|{}|{}x{}'.format(self.device, stage, frame_shape[0], frame_shape[1])
+
+	def _entry(self, stage, frame_shape, create=True):
+		key = self._key(stage, frame_shape)
+		if not create:
+			return self.profile.get(self.host, {}).get(key, {'oom_at': None, 'rates': {}})
+		entries = self.profile.setdefault(self.host, {})
+		return entries.setdefault(key, {'oom_at': None, 'rates': {}})
+
+	def suggest(self, stage, frame_shape):
+		kind = stage.split(':')[0]
+		cap = memory_cap(kind, frame_shape, self.device, self.frame_copies)
+		with self.lock:
+			entry = self._entry(stage, frame_shape, create=False)
+			if entry['oom_at']:
+				cap = min(cap, max(1, entry['oom_at'] // 2))
+			rates = {int(size): rate for size, rate in entry['rates'].items() if int(size) <= cap}
+
+		if not rates:
+			return min(cap, START_SIZES[kind])
+		best = max(rates, key=rates.get)
+		if best == max(rates) and best * 2 <= cap:
+			return best * 2
+		return best
+
+	def observe(self, stage, frame_shape, batch_size, seconds, frames):
+		"""Record that frames frames took seconds at batch_size.
+
+		Partial batches are ignored, since they under-report what batch_size achieves.
+		"""
+		if seconds <= 0 or frames < batch_size:
+			return
+		rate = frames / seconds
+		with self.lock:
+			rates = self._entry(stage, frame_shape)['rates']
+			previous = rates.get(str(batch_size))
+			rates[str(batch_size)] = rate if previous is None else 0.5 * (previous + rate)
+			self.updated.setdefault(self._key(stage, frame_shape), set()).add(str(batch_size))
+
+	def record_oom(self, stage, frame_shape, batch_size):
+		with self.lock:
+			entry = self._entry(stage, frame_shape)
+			entry['oom_at'] = batch_size if not entry['oom_at'] else min(entry['oom_at'], batch_size)
+			entry['rates'] = {size: rate for size, rate in entry['rates'].items() if int(size) < batch_size}
+			self.updated.setdefault(self._key(stage, frame_shape), set())
+
+	def _merge(self, saved):
+		"""saved with this process's updated entries folded in.
+
+		The lower known OOM size wins, this process's rates replace saved
+		ones for the sizes it measured, and rates at or above the OOM size
+		are dropped. Entries this process did not touch are kept as saved.
+		"""
+		entries = saved.setdefault(self.host, {})
+		for key, sizes in self.updated.items():
+			ours = self.profile.get(self.host, {}).get(key, {'oom_at': None, 'rates': {}})
+			entry = entries.setdefault(key, {'oom_at': None, 'rates': {}})
+			oom_sizes = [size for size in (entry['oom_at'], ours['oom_at']) if size]
+			entry['oom_at'] = min(oom_sizes) if oom_sizes else None
+			entry['rates'].update({size: ours['rates'][size] for size in sizes if size in ours['rates']})
+			if entry['oom_at']:
+				entry['rates'] = {size: rate for size, rate in entry['rates'].items() if int(size) < entry['oom_at']}
+		return saved
+
+	def save(self):
+		"""Merge this process's measurements into the profile on disk.
+
+		The read-merge-write runs under an exclusive lock on path + '.lock'
+		so concurrent jobs on the host do not drop each other's entries.
+		"""
+		tmp = None
+		try:
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			with open(self.path + '.lock', 'w') as lock_file:
+				if fcntl is not None:
+					fcntl.flock(lock_file, fcntl.LOCK_EX)
+				with self.lock:
+					self.profile = self._merge(self._read())
+					self.updated = {}
+					data = json.dumps(self.profile, indent=1, sort_keys=True)
+				fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+				with os.fdopen(fd, 'w') as f:
+					f.write(data)
+				os.replace(tmp, self.path)
+		except OSError:
+			if tmp is not None and os.path.exists(tmp):
+				os.remove(tmp)
@@ -0,0 +1,128 @@
+"""Calibrate and check the int8 / bfloat16 CPU modes of the Wav2Lip generator.
+
+Builds calibration batches from sample face images and narrations (the
+repo's assets/ by default), quantizes the BatchNorm-fused model to int8 and
+saves it next to the checkpoint, where --model_mode int8 picks it up. Then
+lip-syncs every sample with the fused, int8 and bf16 models and reports
+throughput and the error against the float model.
+
+With --syncnet_dir pointing at a syncnet_python checkout set up as in
+evaluation/README.md, LSE-D / LSE-C are computed for each video, and the
+script fails if int8 raises LSE-D by more than --max_lse_d_increase.
+
+	python calibrate_quantization.py --checkpoint_path checkpoints/wav2lip.pth
+"""
+import argparse, glob, os, subprocess, sys
+import numpy as np
+import torch
+
+from inference import JobConfig, PipelineConfig, Wav2LipPipeline, load_model
+from optimized_model import artifact_path, save_atomic
+from quantization import quantize_int8
+from workspace import JobWorkspace
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets')
+
+parser = argparse.ArgumentParser(description='Calibrate int8 Wav2Lip and compare quantized CPU modes')
+parser.add_argument('--checkpoint_path', type=str, required=True)
+parser.add_argument('--faces', nargs='+', default=[os.path.join(ASSETS_DIR, 'image.jpg'),
+													os.path.join(ASSETS_DIR, 'image_Testing.png')])
+parser.add_argument('--audios', nargs='+', default=sorted(glob.glob(os.path.join(ASSETS_DIR, 'audio', '*.mp3'))))
+parser.add_argument('--batch_size', type=int, default=32)
+parser.add_argument('--calibration_batches', type=int, default=16,
+					help='Batches used to calibrate; one more per sample is held out to measure error')
+parser.add_argument('--outdir', type=str, default='results/quantization')
+parser.add_argument('--modes', nargs='+', default=['fused', 'int8', 'bf16'])
+parser.add_argument('--syncnet_dir', type=str, default=None,
+					help='syncnet_python checkout with the evaluation/scores_LSE scripts copied in (needs CUDA)')
+parser.add_argument('--max_lse_d_increase', type=float, default=0.5)
+
+def sample_batches(pipeline, face, audio, batch_size):
+	"""(mel_batch, img_batch) model inputs for one face image and narration."""
+	job = JobConfig(face=face, audio=audio)
+	with JobWorkspace() as workspace:
+		frame = next(pipeline.iter_frames(job))
+		face_crop, _ = pipeline.detect_faces([frame], job, workspace)[0]
+		_, mel = pipeline.load_mel(job, workspace)
+	mel_chunks = pipeline.mel_chunks(mel, job.fps)
+
+	face_input = pipeline._batch_buffer(1)
+	pipeline._write_face_input(face_input[0], face_crop)
+	face_input = torch.from_numpy(face_input)
+	for start in range(0, len(mel_chunks), batch_size):
+		mel_batch = torch.from_numpy(mel_chunks.batch(start, start + batch_size))
+		yield mel_batch, face_input.expand(len(mel_batch), -1, -1, -1)
+
+def lse_scores(syncnet_dir, video):
+	"""Mean (LSE-D, LSE-C) of a video, via the evaluation/scores_LSE scripts."""
+	video = os.path.abspath(video)
+	subprocess.check_call([sys.executable, 'run_pipeline.py', '--videofile', video,
+							'--reference', 'wav2lip', '--data_dir', 'tmp_dir'], cwd=syncnet_dir)
+	output = subprocess.check_output([sys.executable, 'calculate_scores_real_videos.py', '--videofile', video,
+									'--reference', 'wav2lip', '--data_dir', 'tmp_dir'], cwd=syncnet_dir)
+	scores = np.array([list(map(float, line.split())) for line in output.decode().splitlines() if line.strip()])
+	return scores[:, 0].mean(), scores[:, 1].mean()
+
+def main():
+	args = parser.parse_args()
+	samples = [(face, audio) for face in args.faces for audio in args.audios]
+	if not samples:
+		raise ValueError('Need at least one face and one audio sample')
+	os.makedirs(args.outdir, exist_ok=True)
+
+	pipeline = Wav2LipPipeline(PipelineConfig(checkpoint_path=args.checkpoint_path, device='cpu',
+												wav2lip_batch_size=args.batch_size))
+	calibration, held_out = [], []
+	for face, audio in samples:
+		batches = list(sample_batches(pipeline, face, audio, args.batch_size))
+		held_out.append(batches.pop())
+		calibration.extend(batches)
+	step = max(1, len(calibration) // args.calibration_batches)
+	calibration = calibration[::step][:args.calibration_batches]
+
+	print('Calibrating int8 on {} batches...'.format(len(calibration)))
+	float_model = load_model(args.checkpoint_path, 'cpu', 'fused')
+	int8_model = quantize_int8(float_model, calibration)
+	path = artifact_path(args.checkpoint_path, 'int8')
+	save_atomic(path, lambda tmp: torch.save(int8_model.state_dict(), tmp))
+	print('Saved int8 model to {}'.format(path))
+
+	with torch.no_grad():
+		reference = [float_model(mel_batch, img_batch) for mel_batch, img_batch in held_out]
+
+	results = {}
+	for mode in args.modes:
+		model = load_model(args.checkpoint_path, 'cpu', mode)
+		with torch.no_grad():
+			errors = [(model(mel_batch, img_batch) - ref).abs()
+						for (mel_batch, img_batch), ref in zip(held_out, reference)]
+		mean_error = torch.cat([e.flatten() for e in errors]).mean().item() * 255.
+
+		mode_pipeline = Wav2LipPipeline(PipelineConfig(checkpoint_path=args.checkpoint_path, device='cpu',
+														model_mode=mode, wav2lip_batch_size=args.batch_size))
+		mode_pipeline.model, mode_pipeline.detector = model, pipeline.detector
+		seconds, lse = 0., []
+		for face, audio in samples:
+			name = '{}_{}_{}.mp4'.format(os.path.splitext(os.path.basename(face))[0],
+										os.path.splitext(os.path.basename(audio))[0], mode)
+			job = JobConfig(face=face, audio=audio, outfile=os.path.join(args.outdir, name))
+			timings = mode_pipeline.run(job)
+			seconds += timings['inference']
+			if args.syncnet_dir:
+				lse.append(lse_scores(args.syncnet_dir, job.outfile))
+		results[mode] = (seconds, mean_error, np.mean(lse, axis=0) if lse else None)
+
+	base_seconds = results[args.modes[0]][0]
+	print('\n{:>6}  {:>10}  {:>8}  {:>12}  {:>7}  {:>7}'.format('mode', 'infer (s)', 'speedup', 'err (0-255)', 'LSE-D', 'LSE-C'))
+	for mode, (seconds, error, scores) in results.items():
+		lse_d, lse_c = scores if scores is not None else (float('nan'), float('nan'))
+		print('{:>6}  {:>10.2f}  {:>7.2f}x  {:>12.3f}  {:>7.3f}  {:>7.3f}'.format(
+			mode, seconds, base_seconds / seconds, error, lse_d, lse_c))
+
+	if args.syncnet_dir and 'fused' in results and 'int8' in results:
+		increase = results['int8'][2][0] - results['fused'][2][0]
+		if increase > args.max_lse_d_increase:
+			raise SystemExit('int8 raises LSE-D by {:.3f} (> {}); do not enable it'.format(increase, args.max_lse_d_increase))
+
+if __name__ == '__main__':
+	main()
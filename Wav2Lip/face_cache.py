@@ -0,0 +1,104 @@
+import os
+import hashlib
+import tempfile
+import threading
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.getenv('WAV2LIP_FACE_CACHE',
+								os.path.join(os.path.expanduser('~'), '.cache', 'wav2lip', 'face_boxes'))
+DEFAULT_MAX_MB = int(os.getenv('WAV2LIP_FACE_CACHE_MB', 256))
+
+# Bump when the detector or its post-processing changes what boxes it returns
+DETECTOR_VERSION = 'sfd-1'
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+def file_digest(file_path):
+	"""sha256 of a file's bytes, memoised on (path, size, mtime) for this process."""
+	stat = os.stat(file_path)
+	memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+	with _hash_lock:
+		if memo_key in _hash_memo:
+			return _hash_memo[memo_key]
+
+	sha = hashlib.sha256()
+	with open(file_path, 'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			sha.update(block)
+	digest = sha.hexdigest()
+
+	with _hash_lock:
+		_hash_memo[memo_key] = digest
+	return digest
+
+class FaceBoxCache:
+	"""On-disk cache of raw S3FD face boxes, keyed by media content.
+
+	Each entry is an (N, 4) int array of (x1, y1, x2, y2) boxes for the first N
+	frames of a face image/video, before padding and smoothing. The directory
+	is shared by every process that points at it (Flask app, worker, CLI) and
+	is trimmed least-recently-used first once it grows past max_bytes.
+	"""
+
+	def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+		self.root = root
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(root, exist_ok=True)
+
+	def key(self, face_path, *params):
+		"""Cache key for a media file plus any settings that change its frames."""
+		parts = [DETECTOR_VERSION, file_digest(face_path)] + [repr(p) for p in params]
+		return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+	def _path(self, key):
+		return os.path.join(self.root, key + '.npy')
+
+	def get(self, key):
+		"""Return the cached (N, 4) boxes for key, or None."""
+		entry = self._path(key)
+		try:
+			boxes = np.load(entry)
+			os.utime(entry)
+		except (OSError, ValueError):
+			self.misses += 1
+			return None
+		self.hits += 1
+		return boxes
+
+	def put(self, key, boxes):
+		boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+		fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				np.save(f, boxes)
+			os.replace(tmp, self._path(key))
+		except OSError:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+			return
+		self.evict()
+
+	def evict(self):
+		"""Delete least recently used entries until the cache fits in max_bytes."""
+		entries = []
+		for name in os.listdir(self.root):
+			if not name.endswith('.npy'):
+				continue
+			try:
+				stat = os.stat(os.path.join(self.root, name))
+			except OSError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, name))
+
+		total = sum(size for _, size, _ in entries)
+		for _, size, name in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			try:
+				os.remove(os.path.join(self.root, name))
+			except OSError:
+				pass
+			total -= size
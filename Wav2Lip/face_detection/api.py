@@ -63,14 +63,13 @@ class FaceAlignment:
 
     def get_detections_for_batch(self, images):
         images = images[..., ::-1]
-        detected_faces = self.face_detector.detect_from_batch(images.copy())
+        detected_faces = self.face_detector.detect_top1_from_batch(images.copy())
         results = []
 
         for i, d in enumerate(detected_faces):
-            if len(d) == 0:
+            if d is None:
                 results.append(None)
                 continue
-            d = d[0]
             d = np.clip(d, 0, None)
             
             x1, y1, x2, y2 = map(int, d[:-1])
@@ -51,6 +51,14 @@ class FaceDetector(object):
         """
         raise NotImplementedError
 
+    def detect_top1_from_batch(self, images):
+        """Return the highest-scoring box (x1, y1, x2, y2, score) of every image, or None.
+
+        Subclasses can override this with something cheaper than running full
+        ``detect_from_batch`` post-processing.
+        """
+        return [d[0] if len(d) else None for d in self.detect_from_batch(images)]
+
     def detect_from_directory(self, path, extensions=['.jpg', '.png'], recursive=False, show_progress_bar=True):
         """Detects faces from all the images present in a given directory.
 
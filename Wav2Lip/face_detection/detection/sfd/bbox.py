@@ -64,6 +64,21 @@ def nms(dets, thresh):
     return keep
 
 
+def batched_nms(dets, idxs, thresh):
+    """Run nms() over boxes from many images in one pass.
+
+    Boxes are shifted by idx * (coordinate span) so boxes of different images
+    can never overlap and therefore never suppress each other. Returns the
+    kept indices into dets, highest score first.
+    """
+    if 0 == len(dets):
+        return np.zeros(0, dtype=np.int64)
+    span = dets[:, :4].max() - dets[:, :4].min() + 2
+    shifted = dets.copy()
+    shifted[:, :4] += (np.asarray(idxs) * span)[:, np.newaxis]
+    return np.asarray(nms(shifted, thresh), dtype=np.int64)
+
+
 def encode(matched, priors, variances):
     """Encode the variances from the priorbox layers into the ground truth boxes
     we have matched (based on jaccard overlap) with the prior boxes.
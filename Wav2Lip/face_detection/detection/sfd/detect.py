@@ -16,46 +16,39 @@ from .net_s3fd import s3fd
 from .bbox import *
 
 
-def detect(net, img, device):
-    img = img - np.array([104, 117, 123])
-    img = img.transpose(2, 0, 1)
-    img = img.reshape((1,) + img.shape)
+_prior_cache = {}
 
-    if 'cuda' in device:
-        torch.backends.cudnn.benchmark = True
 
-    img = torch.from_numpy(img).float().to(device)
-    BB, CC, HH, WW = img.size()
-    with torch.no_grad():
-        olist = net(img)
-
-    bboxlist = []
-    for i in range(len(olist) // 2):
-        olist[i * 2] = F.softmax(olist[i * 2], dim=1)
-    olist = [oelem.data.cpu() for oelem in olist]
-    for i in range(len(olist) // 2):
-        ocls, oreg = olist[i * 2], olist[i * 2 + 1]
-        FB, FC, FH, FW = ocls.size()  # feature map size
-        stride = 2**(i + 2)    # 4,8,16,32,64,128
-        anchor = stride * 4
-        poss = zip(*np.where(ocls[:, 1, :, :] > 0.05))
-        for Iindex, hindex, windex in poss:
-            axc, ayc = stride / 2 + windex * stride, stride / 2 + hindex * stride
-            score = ocls[0, 1, hindex, windex]
-            loc = oreg[0, :, hindex, windex].contiguous().view(1, 4)
-            priors = torch.Tensor([[axc / 1.0, ayc / 1.0, stride * 4 / 1.0, stride * 4 / 1.0]])
-            variances = [0.1, 0.2]
-            box = decode(loc, priors, variances)
-            x1, y1, x2, y2 = box[0] * 1.0
-            # cv2.rectangle(imgshow,(int(x1),int(y1)),(int(x2),int(y2)),(0,0,255),1)
-            bboxlist.append([x1, y1, x2, y2, score])
-    bboxlist = np.array(bboxlist)
+def anchor_priors(FH, FW, stride, device='cpu'):
+    """Return the (FH * FW, 4) center-form anchors of one S3FD level, cached per shape."""
+    key = (FH, FW, stride, str(device))
+    priors = _prior_cache.get(key)
+    if priors is None:
+        ys, xs = torch.meshgrid(torch.arange(FH, dtype=torch.float32),
+                                torch.arange(FW, dtype=torch.float32), indexing='ij')
+        priors = torch.stack([
+            stride / 2 + xs.reshape(-1) * stride,
+            stride / 2 + ys.reshape(-1) * stride,
+            torch.full((FH * FW,), stride * 4.0),
+            torch.full((FH * FW,), stride * 4.0)], 1).to(device)
+        _prior_cache[key] = priors
+    return priors
+
+
+def detect(net, img, device):
+    bboxlist = batch_detect(net, img[np.newaxis], device)[0]
     if 0 == len(bboxlist):
         bboxlist = np.zeros((1, 5))
 
     return bboxlist
 
-def batch_detect(net, imgs, device):
+def batch_detect(net, imgs, device, score_threshold=0.05):
+    """Run S3FD on a batch and decode every anchor scoring above score_threshold.
+
+    Returns one (K_i, 5) array of (x1, y1, x2, y2, score) per image. Anchors
+    are decoded with one tensor operation per feature level instead of one
+    per candidate position.
+    """
     imgs = imgs - np.array([104, 117, 123])
     imgs = imgs.transpose(0, 3, 1, 2)
 
@@ -63,35 +56,40 @@ def batch_detect(net, imgs, device):
         torch.backends.cudnn.benchmark = True
 
     imgs = torch.from_numpy(imgs).float().to(device)
-    BB, CC, HH, WW = imgs.size()
     with torch.no_grad():
         olist = net(imgs)
 
-    bboxlist = []
-    for i in range(len(olist) // 2):
-        olist[i * 2] = F.softmax(olist[i * 2], dim=1)
-    olist = [oelem.data.cpu() for oelem in olist]
-    for i in range(len(olist) // 2):
-        ocls, oreg = olist[i * 2], olist[i * 2 + 1]
-        FB, FC, FH, FW = ocls.size()  # feature map size
-        stride = 2**(i + 2)    # 4,8,16,32,64,128
-        anchor = stride * 4
-        poss = zip(*np.where(ocls[:, 1, :, :] > 0.05))
-        for Iindex, hindex, windex in poss:
-            axc, ayc = stride / 2 + windex * stride, stride / 2 + hindex * stride
-            score = ocls[:, 1, hindex, windex]
-            loc = oreg[:, :, hindex, windex].contiguous().view(BB, 1, 4)
-            priors = torch.Tensor([[axc / 1.0, ayc / 1.0, stride * 4 / 1.0, stride * 4 / 1.0]]).view(1, 1, 4)
-            variances = [0.1, 0.2]
-            box = batch_decode(loc, priors, variances)
-            box = box[:, 0] * 1.0
-            # cv2.rectangle(imgshow,(int(x1),int(y1)),(int(x2),int(y2)),(0,0,255),1)
-            bboxlist.append(torch.cat([box, score.unsqueeze(1)], 1).cpu().numpy())
-    bboxlist = np.array(bboxlist)
-    if 0 == len(bboxlist):
-        bboxlist = np.zeros((1, BB, 5))
+    return decode_detections(olist, score_threshold)
 
-    return bboxlist
+
+def decode_detections(olist, score_threshold=0.05):
+    """Turn raw S3FD outputs into one (K_i, 5) array per image."""
+    BB = olist[0].size(0)
+    variances = [0.1, 0.2]
+    frame_ids, detections = [], []
+    with torch.no_grad():
+        for i in range(len(olist) // 2):
+            ocls, oreg = F.softmax(olist[i * 2], dim=1), olist[i * 2 + 1]
+            FB, FC, FH, FW = ocls.size()  # feature map size
+            stride = 2**(i + 2)    # 4,8,16,32,64,128
+            scores = ocls[:, 1].reshape(FB, -1)
+            frame_idx, pos_idx = torch.nonzero(scores > score_threshold, as_tuple=True)
+            if frame_idx.numel() == 0:
+                continue
+            loc = oreg.permute(0, 2, 3, 1).reshape(FB, -1, 4)[frame_idx, pos_idx]
+            priors = anchor_priors(FH, FW, stride, oreg.device)[pos_idx]
+            boxes = decode(loc, priors, variances)
+            frame_ids.append(frame_idx)
+            detections.append(torch.cat([boxes, scores[frame_idx, pos_idx].unsqueeze(1)], 1))
+
+    if not detections:
+        return [np.zeros((0, 5), dtype=np.float32) for _ in range(BB)]
+
+    frame_ids = torch.cat(frame_ids).cpu().numpy()
+    detections = torch.cat(detections).cpu().numpy()
+    order = np.argsort(frame_ids, kind='stable')
+    splits = np.searchsorted(frame_ids[order], np.arange(1, BB))
+    return np.split(detections[order], splits)
 
 def flip_detect(net, img, device):
     img = cv2.flip(img, 1)
@@ -39,12 +39,20 @@ class SFDDetector(FaceDetector):
         return bboxlist
 
     def detect_from_batch(self, images):
-        bboxlists = batch_detect(self.face_detector, images, device=self.device)
-        keeps = [nms(bboxlists[:, i, :], 0.3) for i in range(bboxlists.shape[1])]
-        bboxlists = [bboxlists[keep, i, :] for i, keep in enumerate(keeps)]
-        bboxlists = [[x for x in bboxlist if x[-1] > 0.5] for bboxlist in bboxlists]
+        # Only boxes scoring > 0.5 are returned, and NMS never lets a lower score
+        # suppress a higher one, so filtering before NMS gives the same result
+        bboxlists = batch_detect(self.face_detector, images, device=self.device, score_threshold=0.5)
+        frame_ids = np.concatenate([np.full(len(b), i) for i, b in enumerate(bboxlists)])
+        keep = batched_nms(np.concatenate(bboxlists), frame_ids, 0.3)
 
-        return bboxlists
+        kept = np.concatenate(bboxlists)[keep]
+        kept_ids = frame_ids[keep]
+        return [list(kept[kept_ids == i]) for i in range(len(bboxlists))]
+
+    def detect_top1_from_batch(self, images):
+        # The first box NMS keeps is always the highest scoring one, so no NMS is needed
+        bboxlists = batch_detect(self.face_detector, images, device=self.device, score_threshold=0.5)
+        return [b[np.argmax(b[:, 4])] if len(b) else None for b in bboxlists]
 
     @property
     def reference_scale(self):
@@ -0,0 +1,66 @@
+import numpy as np
+import cv2
+
+THUMB_SIZE = (64, 36)
+
+def _thumb(image):
+	return cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), THUMB_SIZE,
+						interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def select_keyframes(images, every, motion_threshold):
+	"""Pick the frames that get a full face detection.
+
+	A frame becomes a keyframe when `every` frames have passed since the last
+	one, or when the mean absolute grey-level change from the previous frame
+	(on a small thumbnail) exceeds motion_threshold, e.g. on a cut or a fast
+	head movement. The first and last frame are always keyframes.
+	"""
+	keys = [0]
+	previous = _thumb(images[0])
+	for i in range(1, len(images)):
+		current = _thumb(images[i])
+		motion = np.abs(current - previous).mean()
+		if motion > motion_threshold or i - keys[-1] >= every:
+			keys.append(i)
+		previous = current
+	if keys[-1] != len(images) - 1:
+		keys.append(len(images) - 1)
+	return keys
+
+def box_iou(a, b):
+	x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+	x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+	inter = max(0, x2 - x1) * max(0, y2 - y1)
+	union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+	return inter / union if union > 0 else 0.
+
+def interpolate_rect(a, b, t):
+	return tuple(int(round(va + (vb - va) * t)) for va, vb in zip(a, b))
+
+def sparse_detect(images, detect_fn, every, motion_threshold, min_iou):
+	"""Face rects for images, running detect_fn only on keyframes where possible.
+
+	Rects between two keyframes are linearly interpolated when the keyframe
+	rects agree (IoU >= min_iou). If they disagree, or a keyframe has no face,
+	every frame in between is detected normally.
+	"""
+	if len(images) == 0:
+		return []
+	keys = select_keyframes(images, every, motion_threshold)
+	rects = [None] * len(images)
+	for k, rect in zip(keys, detect_fn([images[k] for k in keys])):
+		rects[k] = rect
+
+	redetect = []
+	for k0, k1 in zip(keys, keys[1:]):
+		a, b = rects[k0], rects[k1]
+		if a is not None and b is not None and box_iou(a, b) >= min_iou:
+			for j in range(k0 + 1, k1):
+				rects[j] = interpolate_rect(a, b, (j - k0) / (k1 - k0))
+		else:
+			redetect.extend(range(k0 + 1, k1))
+
+	if redetect:
+		for j, rect in zip(redetect, detect_fn([images[j] for j in redetect])):
+			rects[j] = rect
+	return rects
@@ -6,7 +6,25 @@ from tqdm import tqdm
 from glob import glob
 import torch, face_detection
 from models import Wav2Lip
-import platform
+from video_io import FFmpegWriter
+from workspace import JobWorkspace
+import face_cache
+from face_cache import FaceBoxCache
+import mel_cache
+from mel_cache import MelCache
+from face_tracking import sparse_detect
+import optimized_model
+import batch_tuning
+from batch_tuning import BatchTuner
+from stages import ProgressReporter, StageMetrics, run_stage, stage_stats
+from inference_scheduler import InferenceScheduler
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, replace
+from itertools import islice
 
 parser = argparse.ArgumentParser(description='Inference code to lip-sync videos in the wild using Wav2Lip models')
 
@@ -28,9 +46,23 @@ parser.add_argument('--fps', type=float, help='Can be specified only if input is
 parser.add_argument('--pads', nargs='+', type=int, default=[0, 10, 0, 0], 
 					help='Padding (top, bottom, left, right). Please adjust to include chin at least')
 
+parser.add_argument('--model_mode', type=str, default='fused', choices=optimized_model.MODES,
+					help='How to run the generator: eager, BatchNorm fused into the convs (cached next to the '
+					'checkpoint), fused + TorchScript, fused + torch.compile, fused + ONNX Runtime (CPU), '
+					'int8 (CPU, see calibrate_quantization.py) or bfloat16')
+
 parser.add_argument('--face_det_batch_size', type=int, 
-					help='Batch size for face detection', default=16)
-parser.add_argument('--wav2lip_batch_size', type=int, help='Batch size for Wav2Lip model(s)', default=128)
+					help='Batch size for face detection (default: chosen from free memory and the host batch profile)', default=None)
+parser.add_argument('--wav2lip_batch_size', type=int, help='Batch size for Wav2Lip model(s) (default: chosen like --face_det_batch_size)', default=None)
+parser.add_argument('--scheduler_max_batch', type=int, default=0,
+					help='Coalesce concurrent jobs\' Wav2Lip batches into model passes of up to this many samples '
+					'(0 = every job runs its own batches)')
+parser.add_argument('--scheduler_max_wait_ms', type=float, default=10.,
+					help='How long a coalesced batch waits for other jobs\' requests')
+parser.add_argument('--batch_profile', type=str, default=batch_tuning.DEFAULT_PROFILE,
+					help='JSON file of measured per-host batch throughput used to choose batch sizes')
+parser.add_argument('--no_batch_profile', dest='batch_profile', action='store_const', const=None,
+					help='Use the fixed starting batch sizes instead of tuning them')
 
 parser.add_argument('--resize_factor', default=1, type=int, 
 			help='Reduce the resolution by this factor. Sometimes, best results are obtained at 480p or 720p')
@@ -50,11 +82,122 @@ parser.add_argument('--rotate', default=False, action='store_true',
 parser.add_argument('--nosmooth', default=False, action='store_true',
 					help='Prevent smoothing face detections over a short temporal window')
 
-args = parser.parse_args()
-args.img_size = 96
+parser.add_argument('--detect_short_side', type=int, default=720,
+					help='Run face detection on a copy downscaled to this short side; boxes are mapped back to full resolution (0 = native)')
+parser.add_argument('--detect_every', type=int, default=1,
+					help='Run face detection on every Nth frame only and interpolate boxes in between (1 = every frame)')
+parser.add_argument('--motion_threshold', type=float, default=12.,
+					help='Mean grey-level change between frames that forces an extra keyframe detection')
+parser.add_argument('--keyframe_iou', type=float, default=0.5,
+					help='Minimum IoU of two keyframe boxes to interpolate between them instead of detecting every frame')
+
+parser.add_argument('--seamless', default=False, action='store_true',
+					help='Poisson-blend the generated face into the frame instead of pasting the box')
+parser.add_argument('--paste_workers', type=int, default=None,
+					help='Threads that resize and paste generated faces while the model runs the next batch '
+					'(default: min(4, CPU count))')
+parser.add_argument('--batch_workers', type=int, default=2,
+					help='Threads that crop, resize and normalise faces into model batches')
+parser.add_argument('--stage_queue_size', type=int, default=2,
+					help='Wav2Lip batches the batching and inference stages may run ahead of the next '
+					'(decode and detection queue one face detection batch of frames); 0 runs the stages '
+					'one after another on one thread. Deeper queues shrink the tuned batch size to fit memory')
+
+parser.add_argument('--preset', type=str, default='veryfast',
+					help='x264 preset used to encode the output video')
+parser.add_argument('--crf', type=int, default=23,
+					help='x264 constant rate factor of the output video (lower is higher quality)')
+
+parser.add_argument('--tmpdir', type=str, default=None,
+					help='Directory for per-job scratch files (default: $WAV2LIP_TMPDIR, /dev/shm or the system temp dir)')
+parser.add_argument('--keep_workspace', default=False, action='store_true',
+					help='Keep the per-job scratch directory (converted audio, faulty frames) for debugging')
+
+parser.add_argument('--face_cache_dir', type=str, default=face_cache.DEFAULT_CACHE_DIR,
+					help='Directory of the content-addressed face box cache shared with other Wav2Lip processes')
+parser.add_argument('--no_face_cache', dest='face_cache_dir', action='store_const', const=None,
+					help='Always run face detection instead of reusing cached boxes')
+
+parser.add_argument('--mel_cache_dir', type=str, default=mel_cache.DEFAULT_CACHE_DIR,
+					help='Directory of the content-addressed 16 kHz PCM / mel spectrogram cache shared with the TTS stage')
+parser.add_argument('--no_mel_cache', dest='mel_cache_dir', action='store_const', const=None,
+					help='Always convert the audio and compute its mel spectrogram')
+
+parser.add_argument('--no_stream', dest='stream', default=True, action='store_false',
+					help='Load the whole input video into memory instead of streaming it through the model')
+
+IMAGE_EXTENSIONS = ['jpg', 'png', 'jpeg', 'webp']
+
+mel_step_size = 16
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
 
-if os.path.isfile(args.face) and args.face.split('.')[1] in ['jpg', 'png', 'jpeg']:
-	args.static = True
+@dataclass
+class PipelineConfig:
+	"""Settings fixed for the lifetime of a loaded Wav2LipPipeline."""
+	checkpoint_path: str
+	device: str = device
+	model_mode: str = 'fused'
+	img_size: int = 96
+	# None: chosen per job by a BatchTuner from free memory and measured throughput
+	wav2lip_batch_size: int = None
+	face_det_batch_size: int = None
+	batch_profile: str = batch_tuning.DEFAULT_PROFILE
+	# > 0: one InferenceScheduler coalesces the batches of concurrent jobs up to this size
+	scheduler_max_batch: int = 0
+	scheduler_max_wait_ms: float = 10.
+	paste_workers: int = None
+	batch_workers: int = 2
+	# Batches a stage may run ahead of the next one; 0 disables the threaded stages
+	stage_queue_size: int = 2
+	face_cache_dir: str = face_cache.DEFAULT_CACHE_DIR
+	face_cache_max_mb: int = face_cache.DEFAULT_MAX_MB
+	mel_cache_dir: str = mel_cache.DEFAULT_CACHE_DIR
+	mel_cache_max_mb: int = mel_cache.DEFAULT_MAX_MB
+
+@dataclass
+class JobConfig:
+	"""Per-request settings; mirrors the inference.py command line."""
+	face: str
+	audio: str
+	outfile: str = 'results/result_voice.mp4'
+	static: bool = False
+	fps: float = 25.
+	pads: tuple = (0, 10, 0, 0)
+	resize_factor: int = 1
+	crop: tuple = (0, -1, 0, -1)
+	box: tuple = (-1, -1, -1, -1)
+	rotate: bool = False
+	nosmooth: bool = False
+	seamless: bool = False
+	detect_short_side: int = 720
+	detect_every: int = 1
+	motion_threshold: float = 12.
+	keyframe_iou: float = 0.5
+	# Filled in by Wav2LipPipeline.plan_batches unless pinned here or in PipelineConfig
+	face_det_batch_size: int = None
+	wav2lip_batch_size: int = None
+	stream: bool = True
+	preset: str = 'veryfast'
+	crf: int = 23
+	workspace_root: str = None
+	keep_workspace: bool = False
+
+	def __post_init__(self):
+		if is_image(self.face):
+			self.static = True
+
+def is_image(face_path):
+	return path.splitext(face_path)[1][1:].lower() in IMAGE_EXTENSIONS
+
+@contextmanager
+def stage(timings, name):
+	"""Accumulate the wall-clock time spent in a block under timings[name]."""
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		if timings is not None:
+			timings[name] = timings.get(name, 0.) + time.perf_counter() - start
 
 def get_smoothened_boxes(boxes, T):
 	for i in range(len(boxes)):
@@ -65,109 +208,68 @@ def get_smoothened_boxes(boxes, T):
 		boxes[i] = np.mean(window, axis=0)
 	return boxes
 
-def face_detect(images):
-	detector = face_detection.FaceAlignment(face_detection.LandmarksType._2D, 
-											flip_input=False, device=device)
-
-	batch_size = args.face_det_batch_size
-	
+def smoothen_box_stream(boxes, T):
+	"""Streaming equivalent of get_smoothened_boxes over an iterator of boxes.
+
+	Holds at most T boxes at a time and yields exactly what
+	get_smoothened_boxes would produce for the full sequence.
+	"""
+	window = []
+	pending = 0
+	for box in boxes:
+		window.append(box)
+		pending += 1
+		if pending == T:
+			i = len(window) - T
+			window[i] = np.mean(window[i:], axis=0).astype(box.dtype)
+			yield window[i]
+			pending -= 1
+			del window[:len(window) - T]
+	for i in range(len(window) - pending, len(window)):
+		window[i] = np.mean(window[len(window) - T:], axis=0).astype(window[i].dtype)
+		yield window[i]
+
+def iter_chunks(iterable, size):
+	iterator = iter(iterable)
 	while 1:
-		predictions = []
-		try:
-			for i in tqdm(range(0, len(images), batch_size)):
-				predictions.extend(detector.get_detections_for_batch(np.array(images[i:i + batch_size])))
-		except RuntimeError:
-			if batch_size == 1: 
-				raise RuntimeError('Image too big to run face detection on GPU. Please use the --resize_factor argument')
-			batch_size //= 2
-			print('Recovering from OOM error; New batch size: {}'.format(batch_size))
-			continue
-		break
-
-	results = []
-	pady1, pady2, padx1, padx2 = args.pads
-	for rect, image in zip(predictions, images):
-		if rect is None:
-			cv2.imwrite('temp/faulty_frame.jpg', image) # check this frame where the face was not detected.
-			raise ValueError('Face not detected! Ensure the video contains a face in all the frames.')
-
-		y1 = max(0, rect[1] - pady1)
-		y2 = min(image.shape[0], rect[3] + pady2)
-		x1 = max(0, rect[0] - padx1)
-		x2 = min(image.shape[1], rect[2] + padx2)
-		
-		results.append([x1, y1, x2, y2])
+		chunk = list(islice(iterator, size))
+		if not chunk:
+			return
+		yield chunk
 
-	boxes = np.array(results)
-	if not args.nosmooth: boxes = get_smoothened_boxes(boxes, T=5)
-	results = [[image[y1: y2, x1:x2], (y1, y2, x1, x2)] for image, (x1, y1, x2, y2) in zip(images, boxes)]
+class MelChunks:
+	"""The mel window of every output frame, gathered one batch at a time.
 
-	del detector
-	return results 
+	windows is a strided (num_cols - mel_step_size + 1, num_mels,
+	mel_step_size) view of the spectrogram and starts the window index of
+	each frame, so only the batch being fed to the model is ever copied.
+	"""
 
-def datagen(frames, mels):
-	img_batch, mel_batch, frame_batch, coords_batch = [], [], [], []
+	def __init__(self, windows, starts):
+		self.windows = windows
+		self.starts = starts
 
-	if args.box[0] == -1:
-		if not args.static:
-			face_det_results = face_detect(frames) # BGR2RGB for CNN face detection
-		else:
-			face_det_results = face_detect([frames[0]])
-	else:
-		print('Using the specified bounding box instead of face detection...')
-		y1, y2, x1, x2 = args.box
-		face_det_results = [[f[y1: y2, x1:x2], (y1, y2, x1, x2)] for f in frames]
-
-	for i, m in enumerate(mels):
-		idx = 0 if args.static else i%len(frames)
-		frame_to_save = frames[idx].copy()
-		face, coords = face_det_results[idx].copy()
-
-		face = cv2.resize(face, (args.img_size, args.img_size))
-			
-		img_batch.append(face)
-		mel_batch.append(m)
-		frame_batch.append(frame_to_save)
-		coords_batch.append(coords)
-
-		if len(img_batch) >= args.wav2lip_batch_size:
-			img_batch, mel_batch = np.asarray(img_batch), np.asarray(mel_batch)
-
-			img_masked = img_batch.copy()
-			img_masked[:, args.img_size//2:] = 0
-
-			img_batch = np.concatenate((img_masked, img_batch), axis=3) / 255.
-			mel_batch = np.reshape(mel_batch, [len(mel_batch), mel_batch.shape[1], mel_batch.shape[2], 1])
+	def __len__(self):
+		return len(self.starts)
 
-			yield img_batch, mel_batch, frame_batch, coords_batch
-			img_batch, mel_batch, frame_batch, coords_batch = [], [], [], []
-
-	if len(img_batch) > 0:
-		img_batch, mel_batch = np.asarray(img_batch), np.asarray(mel_batch)
-
-		img_masked = img_batch.copy()
-		img_masked[:, args.img_size//2:] = 0
-
-		img_batch = np.concatenate((img_masked, img_batch), axis=3) / 255.
-		mel_batch = np.reshape(mel_batch, [len(mel_batch), mel_batch.shape[1], mel_batch.shape[2], 1])
-
-		yield img_batch, mel_batch, frame_batch, coords_batch
-
-mel_step_size = 16
-device = 'cuda' if torch.cuda.is_available() else 'cpu'
-print('Using {} for inference.'.format(device))
+	def batch(self, start, stop):
+		"""(n, 1, num_mels, mel_step_size) float32 model input for frames start:stop."""
+		return self.windows[self.starts[start:stop]][:, np.newaxis]
 
-def _load(checkpoint_path):
+def _load(checkpoint_path, device=device):
 	if device == 'cuda':
 		checkpoint = torch.load(checkpoint_path)
 	else:
 		checkpoint = torch.load(checkpoint_path, map_location=lambda storage, loc: storage, weights_only=False)
 	return checkpoint
 
-def load_model(path):
+def load_model(path, device=device, mode='eager'):
+	if mode != 'eager':
+		return optimized_model.load(path, device, mode, lambda: load_model(path, device))
+
 	model = Wav2Lip()
 	print("Load checkpoint from: {}".format(path))
-	checkpoint = _load(path)
+	checkpoint = _load(path, device)
 	s = checkpoint["state_dict"]
 	new_s = {}
 	for k, v in s.items():
@@ -177,103 +279,700 @@ def load_model(path):
 	model = model.to(device)
 	return model.eval()
 
-def main():
-	if not os.path.isfile(args.face):
-		raise ValueError('--face argument must be a valid path to video/image file')
-
-	elif args.face.split('.')[1] in ['jpg', 'png', 'jpeg']:
-		full_frames = [cv2.imread(args.face)]
-		fps = args.fps
+def load_detector(device=device):
+	return face_detection.FaceAlignment(face_detection.LandmarksType._2D,
+											flip_input=False, device=device)
 
-	else:
-		video_stream = cv2.VideoCapture(args.face)
+class Wav2LipPipeline:
+	"""Importable Wav2Lip inference.
+
+	load() once, then call run() (or the individual stages) for as many jobs
+	as needed. The pipeline keeps no per-job state, so several jobs may share
+	one loaded instance.
+	"""
+
+	def __init__(self, config):
+		self.config = config
+		self.model = None
+		self.detector = None
+		self.scheduler = None
+		self._scheduler_lock = threading.Lock()
+		self.face_cache = None
+		if config.face_cache_dir:
+			self.face_cache = FaceBoxCache(config.face_cache_dir, config.face_cache_max_mb * 1024 * 1024)
+		self.mel_cache = None
+		if config.mel_cache_dir:
+			self.mel_cache = MelCache(config.mel_cache_dir, config.mel_cache_max_mb * 1024 * 1024)
+		self.tuner = None
+		if config.batch_profile:
+			self.tuner = BatchTuner(config.device, config.batch_profile,
+									batch_tuning.generate_frame_copies(config.stage_queue_size))
+		self.paste_workers = config.paste_workers or min(4, os.cpu_count() or 1)
+		self.paste_pool = ThreadPoolExecutor(self.paste_workers, thread_name_prefix='wav2lip-paste')
+		self.batch_pool = None
+		if config.batch_workers > 1:
+			self.batch_pool = ThreadPoolExecutor(config.batch_workers, thread_name_prefix='wav2lip-batch')
+
+	def load(self):
+		self._ensure_model()
+		if self.detector is None:
+			self.detector = load_detector(self.config.device)
+		return self
+
+	def probe_fps(self, job):
+		"""Return the frame rate of the job's face input without decoding it."""
+		if is_image(job.face):
+			return job.fps
+		video_stream = cv2.VideoCapture(job.face)
 		fps = video_stream.get(cv2.CAP_PROP_FPS)
+		video_stream.release()
+		return fps
 
-		print('Reading video frames...')
+	def _prepare_frame(self, frame, job):
+		if job.resize_factor > 1:
+			frame = cv2.resize(frame, (frame.shape[1]//job.resize_factor, frame.shape[0]//job.resize_factor))
 
-		full_frames = []
-		while 1:
-			still_reading, frame = video_stream.read()
-			if not still_reading:
-				video_stream.release()
-				break
-			if args.resize_factor > 1:
-				frame = cv2.resize(frame, (frame.shape[1]//args.resize_factor, frame.shape[0]//args.resize_factor))
+		if job.rotate:
+			frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
 
-			if args.rotate:
-				frame = cv2.rotate(frame, cv2.cv2.ROTATE_90_CLOCKWISE)
+		y1, y2, x1, x2 = job.crop
+		if x2 == -1: x2 = frame.shape[1]
+		if y2 == -1: y2 = frame.shape[0]
 
-			y1, y2, x1, x2 = args.crop
-			if x2 == -1: x2 = frame.shape[1]
-			if y2 == -1: y2 = frame.shape[0]
+		return frame[y1:y2, x1:x2]
 
-			frame = frame[y1:y2, x1:x2]
+	def iter_frames(self, job):
+		"""Yield the job's preprocessed face frames one at a time."""
+		if not os.path.isfile(job.face):
+			raise ValueError('--face argument must be a valid path to video/image file')
 
-			full_frames.append(frame)
+		elif is_image(job.face):
+			yield cv2.imread(job.face)
+			return
 
-	print ("Number of frames available for inference: "+str(len(full_frames)))
+		video_stream = cv2.VideoCapture(job.face)
+		try:
+			while 1:
+				still_reading, frame = video_stream.read()
+				if not still_reading:
+					break
+				yield self._prepare_frame(frame, job)
+		finally:
+			video_stream.release()
+
+	def read_frames(self, job):
+		"""Return (frames, fps) for the face image or video of a job."""
+		if not is_image(job.face):
+			print('Reading video frames...')
+		return list(self.iter_frames(job)), self.probe_fps(job)
+
+	def load_audio(self, job, workspace):
+		"""Return the path of a wav version of the job's audio, converting into workspace if needed."""
+		if job.audio.endswith('.wav'):
+			return job.audio
 
-	if not args.audio.endswith('.wav'):
 		print('Extracting raw audio...')
-		command = 'ffmpeg -y -i {} -strict -2 {}'.format(args.audio, 'temp/temp.wav')
+		temp_wav = workspace.path('temp.wav')
+		command = 'ffmpeg -y -i {} -strict -2 {}'.format(job.audio, temp_wav)
 
 		subprocess.call(command, shell=True)
-		args.audio = 'temp/temp.wav'
-
-	wav = audio.load_wav(args.audio, 16000)
-	mel = audio.melspectrogram(wav)
-	print(mel.shape)
+		return temp_wav
+
+	def load_mel(self, job, workspace):
+		"""Return (audio path to mux, mel spectrogram) for the job's audio.
+
+		With the mel cache enabled the spectrogram comes straight from the
+		cache (filled by the TTS stage or an earlier job), and the original
+		audio is muxed as is.
+		"""
+		if self.mel_cache is not None:
+			_, mel = self.mel_cache.prepare(job.audio)
+			return job.audio, mel
+
+		audio_path = self.load_audio(job, workspace)
+		return audio_path, audio.melspectrogram(audio.load_wav(audio_path, 16000))
+
+	def mel_chunks(self, mel, fps):
+		"""Return the MelChunks holding the mel window of every output frame.
+
+		Frame i starts at mel column int(i * 80 / fps); the last window is
+		aligned to the end of the utterance. Windows stay a strided view of
+		mel until a batch of them is requested.
+		"""
+		print(mel.shape)
+
+		if np.isnan(mel.reshape(-1)).sum() > 0:
+			raise ValueError('Mel contains nan! Using a TTS voice? Add a small epsilon noise to the wav file and try again')
+
+		num_cols = mel.shape[1]
+		if num_cols < mel_step_size:
+			raise ValueError('Audio is too short for lip-sync: {} mel frames'.format(num_cols))
+
+		# (num_cols - mel_step_size + 1, num_mels, mel_step_size) view, no copy
+		windows = np.lib.stride_tricks.sliding_window_view(mel.astype(np.float32), mel_step_size, axis=1)
+		windows = windows.transpose(1, 0, 2)
+
+		mel_idx_multiplier = 80./fps
+		last_start = num_cols - mel_step_size
+		starts = (np.arange(int(last_start / mel_idx_multiplier) + 2) * mel_idx_multiplier).astype(int)
+		starts = np.append(starts[starts <= last_start], last_start)
+		mel_chunks = MelChunks(windows, starts)
+
+		print("Length of mel chunks: {}".format(len(mel_chunks)))
+		return mel_chunks
+
+	def _detect_rects(self, images, short_side=0, batch_size=None):
+		"""Run S3FD over images, halving the batch size on OOM.
+
+		With short_side set, detection runs on a copy downscaled so its shorter
+		edge is short_side pixels and the boxes are scaled back to the input.
+		"""
+		if self.detector is None:
+			self.detector = load_detector(self.config.device)
+		if len(images) == 0:
+			return []
+
+		height, width = images[0].shape[:2]
+		scale = short_side / min(height, width) if short_side else 1.
+		if scale < 1:
+			size = (int(round(width * scale)), int(round(height * scale)))
+			images = [cv2.resize(image, size, interpolation=cv2.INTER_AREA) for image in images]
+
+		batch_size = batch_size or self.config.face_det_batch_size or batch_tuning.START_SIZES['detect']
+		shape = images[0].shape
 
-	if np.isnan(mel.reshape(-1)).sum() > 0:
-		raise ValueError('Mel contains nan! Using a TTS voice? Add a small epsilon noise to the wav file and try again')
-
-	mel_chunks = []
-	mel_idx_multiplier = 80./fps 
-	i = 0
-	while 1:
-		start_idx = int(i * mel_idx_multiplier)
-		if start_idx + mel_step_size > len(mel[0]):
-			mel_chunks.append(mel[:, len(mel[0]) - mel_step_size:])
+		while 1:
+			predictions = []
+			try:
+				for i in range(0, len(images), batch_size):
+					batch_start = time.perf_counter()
+					predictions.extend(self.detector.get_detections_for_batch(np.array(images[i:i + batch_size])))
+					self._observe('detect', shape, batch_size, time.perf_counter() - batch_start,
+								  len(images[i:i + batch_size]))
+			except (RuntimeError, MemoryError) as e:
+				# Only real OOMs are worth retrying smaller, and only they may lower the tuner's cap
+				if not batch_tuning.is_oom(e):
+					raise
+				if batch_size == 1:
+					raise RuntimeError('Image too big to run face detection on GPU. Please use the --resize_factor or a smaller --detect_short_side argument')
+				if self.tuner is not None:
+					self.tuner.record_oom('detect', shape, batch_size)
+				batch_size //= 2
+				print('Recovering from OOM error; New batch size: {}'.format(batch_size))
+				continue
 			break
-		mel_chunks.append(mel[:, start_idx : start_idx + mel_step_size])
-		i += 1
-
-	print("Length of mel chunks: {}".format(len(mel_chunks)))
 
-	full_frames = full_frames[:len(mel_chunks)]
+		if scale < 1:
+			predictions = [None if rect is None else
+						   (int(rect[0] / scale), int(rect[1] / scale),
+							min(width, int(np.ceil(rect[2] / scale))), min(height, int(np.ceil(rect[3] / scale))))
+						   for rect in predictions]
+		return predictions
 
-	batch_size = args.wav2lip_batch_size
-	gen = datagen(full_frames.copy(), mel_chunks)
+	def _pad_rect(self, rect, image, job, workspace=None):
+		if rect is None:
+			if workspace is not None:
+				cv2.imwrite(workspace.path('faulty_frame.jpg'), image) # check this frame where the face was not detected.
+			raise ValueError('Face not detected! Ensure the video contains a face in all the frames.')
 
-	for i, (img_batch, mel_batch, frames, coords) in enumerate(tqdm(gen, 
-											total=int(np.ceil(float(len(mel_chunks))/batch_size)))):
-		if i == 0:
-			model = load_model(args.checkpoint_path)
+		pady1, pady2, padx1, padx2 = job.pads
+		y1 = max(0, rect[1] - pady1)
+		y2 = min(image.shape[0], rect[3] + pady2)
+		x1 = max(0, rect[0] - padx1)
+		x2 = min(image.shape[1], rect[2] + padx2)
+		return [x1, y1, x2, y2]
+
+	def _chunk_rects(self, images, job):
+		detect = lambda batch: self._detect_rects(batch, job.detect_short_side, self._det_batch_size(job))
+		if job.detect_every <= 1:
+			return detect(images)
+		return sparse_detect(images, detect, job.detect_every,
+							 job.motion_threshold, job.keyframe_iou)
+
+	def face_cache_key(self, job):
+		if self.face_cache is None or not os.path.isfile(job.face):
+			return None
+		params = [job.resize_factor, tuple(job.crop), job.rotate, job.detect_short_side]
+		if job.detect_every > 1:
+			# Interpolated boxes must never be served to a job asking for full detection
+			params += [job.detect_every, job.motion_threshold, job.keyframe_iou]
+		return self.face_cache.key(job.face, *params)
+
+	def iter_rects(self, images, job, timings=None):
+		"""Yield (image, rect) for an image iterator, reading boxes from the face cache when possible.
+
+		Frames beyond what the cache holds are detected and the extended box
+		list is written back, so the next job on the same media skips S3FD.
+		With job.detect_every > 1 only keyframes go through S3FD and the boxes
+		in between are interpolated (see face_tracking.sparse_detect).
+		"""
+		key = self.face_cache_key(job)
+		cached = self.face_cache.get(key) if key else None
+		cached = [] if cached is None else [tuple(int(v) for v in rect) for rect in cached]
+		if cached:
+			print('Using {} cached face boxes'.format(len(cached)))
+
+		rects = []
+		detected = False
+		# Sparse chunks are detect_every times longer so keyframes still fill a detector batch
+		chunk_size = self._det_batch_size(job) * max(1, job.detect_every)
+		for chunk in iter_chunks(images, chunk_size):
+			chunk_rects = cached[len(rects):len(rects) + len(chunk)]
+			if len(chunk_rects) < len(chunk):
+				with stage(timings, 'face_detection'):
+					chunk_rects = chunk_rects + self._chunk_rects(chunk[len(chunk_rects):], job)
+				detected = True
+			rects.extend(chunk_rects)
+			for image, rect in zip(chunk, chunk_rects):
+				yield image, rect
+
+		if key and detected and None not in rects:
+			self.face_cache.put(key, rects)
+
+	def detect_faces(self, frames, job, workspace=None):
+		"""Return [face_crop, (y1, y2, x1, x2)] for every frame."""
+		if job.box[0] != -1:
+			print('Using the specified bounding box instead of face detection...')
+			y1, y2, x1, x2 = job.box
+			return [[f[y1: y2, x1:x2], (y1, y2, x1, x2)] for f in frames]
+
+		images = frames
+		results = [self._pad_rect(rect, image, job, workspace) for image, rect in self.iter_rects(images, job)]
+
+		boxes = np.array(results)
+		if not job.nosmooth: boxes = get_smoothened_boxes(boxes, T=5)
+		results = [[image[y1: y2, x1:x2], (y1, y2, x1, x2)] for image, (x1, y1, x2, y2) in zip(images, boxes)]
+
+		return results
+
+	def stream_faces(self, frames, job, workspace=None, timings=None):
+		"""Yield (frame, (y1, y2, x1, x2)) for a frame iterator, detecting chunk by chunk.
+
+		Only face_det_batch_size (times detect_every) frames plus the smoothing
+		window are held at once.
+		"""
+		if job.box[0] != -1:
+			for f in frames:
+				yield f, tuple(job.box)
+			return
+
+		pending = deque()
+		def padded_rects():
+			for image, rect in self.iter_rects(frames, job, timings):
+				pending.append(image)
+				yield np.array(self._pad_rect(rect, image, job, workspace))
+
+		boxes = padded_rects() if job.nosmooth else smoothen_box_stream(padded_rects(), T=5)
+		for x1, y1, x2, y2 in boxes:
+			yield pending.popleft(), (y1, y2, x1, x2)
+
+	def stream_items(self, job, count, workspace=None, timings=None, metrics=None):
+		"""Yield count (frame, face_crop, coords) items without holding the whole video.
+
+		When the audio outlasts the video, frames are decoded again from the
+		start and the boxes found on the first pass are reused. Decoding runs
+		as its own stage, ahead of detection. Still faces go through
+		infer_static instead.
+		"""
+		frames = run_stage(self.iter_frames(job), 'decode', self._queue_size(2 * self._det_batch_size(job)), metrics)
+		seen = []
+		try:
+			for frame, coords in self.stream_faces(islice(frames, count), job, workspace, timings):
+				seen.append(coords)
+				y1, y2, x1, x2 = coords
+				yield frame, frame[y1:y2, x1:x2], coords
+		finally:
+			# Stop the decode stage now, even when an error keeps this frame alive
+			frames.close()
+		if not seen:
+			raise ValueError('No frames could be read from {}'.format(job.face))
+
+		produced = len(seen)
+		while produced < count:
+			replay = islice(self.iter_frames(job), min(len(seen), count - produced))
+			for frame, coords in zip(replay, seen):
+				y1, y2, x1, x2 = coords
+				yield frame, frame[y1:y2, x1:x2], coords
+				produced += 1
+
+	def _queue_size(self, items):
+		"""Queue size for a threaded stage, or 0 when PipelineConfig disables them."""
+		return items if self.config.stage_queue_size > 0 else 0
+
+	def _generate_stage(self):
+		return 'generate:' + self.config.model_mode
+
+	def _det_batch_size(self, job=None):
+		return ((job and job.face_det_batch_size) or self.config.face_det_batch_size
+				or batch_tuning.START_SIZES['detect'])
+
+	def _gen_batch_size(self, job=None):
+		return ((job and job.wav2lip_batch_size) or self.config.wav2lip_batch_size
+				or batch_tuning.START_SIZES['generate'])
+
+	def _observe(self, stage_name, frame_shape, batch_size, seconds, frames):
+		# None: a scheduler pass shared with other jobs, which says nothing about batch_size
+		if self.tuner is not None and seconds is not None:
+			self.tuner.observe(stage_name, frame_shape, batch_size, seconds, frames)
+
+	def plan_batches(self, job, frame_shape):
+		"""Return job with its batch sizes filled in for frames of frame_shape.
+
+		Sizes pinned in the job or the PipelineConfig are kept; the rest come
+		from the BatchTuner (free memory, past OOMs, measured throughput).
+		"""
+		if self.tuner is None:
+			return job
+
+		det_shape = frame_shape
+		if job.detect_short_side and min(frame_shape[:2]) > job.detect_short_side:
+			scale = job.detect_short_side / min(frame_shape[:2])
+			det_shape = (int(round(frame_shape[0] * scale)), int(round(frame_shape[1] * scale)))
+
+		wav2lip_batch_size = (job.wav2lip_batch_size or self.config.wav2lip_batch_size
+							  or self.tuner.suggest(self._generate_stage(), frame_shape))
+		if self.config.scheduler_max_batch:
+			wav2lip_batch_size = min(wav2lip_batch_size, self.config.scheduler_max_batch)
+		job = replace(job,
+					  face_det_batch_size=(job.face_det_batch_size or self.config.face_det_batch_size
+										   or self.tuner.suggest('detect', det_shape)),
+					  wav2lip_batch_size=wav2lip_batch_size)
+		print('Batch sizes: face detection {}, Wav2Lip {}'.format(job.face_det_batch_size, job.wav2lip_batch_size))
+		return job
+
+	def _batch_buffer(self, size):
+		"""float32 NCHW buffer for size face inputs, in pinned memory when feeding a GPU."""
+		shape = (size, 6, self.config.img_size, self.config.img_size)
+		if str(self.config.device).startswith('cuda'):
+			return torch.empty(shape, dtype=torch.float32, pin_memory=True).numpy()
+		return np.empty(shape, dtype=np.float32)
+
+	def _write_face_input(self, out, face):
+		"""Fill a (6, img_size, img_size) slot with the masked and reference face crop."""
+		img_size = self.config.img_size
+		face = cv2.resize(face, (img_size, img_size)).transpose(2, 0, 1)
+		np.divide(face, np.float32(255.), out=out[3:])
+		out[:3, :img_size//2] = out[3:, :img_size//2]
+		out[:3, img_size//2:] = 0
+
+	def _fill_batch(self, img_buffer, faces):
+		if self.batch_pool is None or len(faces) < 2 * self.config.batch_workers:
+			for out, face in zip(img_buffer, faces):
+				self._write_face_input(out, face)
+			return
+
+		def fill(start, stop):
+			for i in range(start, stop):
+				self._write_face_input(img_buffer[i], faces[i])
+		step = -(-len(faces) // self.config.batch_workers)
+		for future in [self.batch_pool.submit(fill, start, min(start + step, len(faces)))
+					   for start in range(0, len(faces), step)]:
+			future.result()
+
+	def datagen(self, items, mels, batch_size=None, buffers=1):
+		"""Group (frame, face_crop, coords) items and their mel chunks into model batches.
+
+		Batches are float32 NCHW, ready for torch.from_numpy. Faces are written
+		straight into a ring of `buffers` preallocated buffers (masked copy in
+		channels 0-2, reference in 3-5), split over batch_pool, so a batch is
+		only valid until `buffers` more have been requested. Mel batches are
+		gathered from mels as they are yielded.
+		"""
+		batch_size = batch_size or self._gen_batch_size()
+		ring = [self._batch_buffer(min(batch_size, len(mels))) for _ in range(buffers)]
+		mel_start = 0
+
+		for i, batch in enumerate(iter_chunks(islice(items, len(mels)), batch_size)):
+			frame_batch, faces, coords_batch = zip(*batch)
+			n = len(batch)
+			img_buffer = ring[i % buffers][:n]
+			self._fill_batch(img_buffer, faces)
+			yield img_buffer, mels.batch(mel_start, mel_start + n), list(frame_batch), list(coords_batch)
+			mel_start += n
+
+	def infer(self, frames, mel_chunks, job, face_det_results=None, workspace=None, timings=None, metrics=None):
+		"""Yield lip-synced output frames, one per mel chunk."""
+		if face_det_results is None:
+			with stage(timings, 'face_detection'):
+				face_det_results = self.detect_faces(frames if not job.static else [frames[0]], job, workspace)
+
+		def items():
+			for i in range(len(mel_chunks)):
+				idx = 0 if job.static else i%len(frames)
+				face, coords = face_det_results[idx]
+				yield frames[idx].copy(), face, coords
+
+		return self.infer_items(items(), mel_chunks, timings, self._gen_batch_size(job), job.seamless, metrics)
+
+	def _ensure_model(self, timings=None):
+		if self.model is None:
+			with stage(timings, 'load_model'):
+				self.model = load_model(self.config.checkpoint_path, self.config.device, self.config.model_mode)
 			print ("Model loaded")
-
-			frame_h, frame_w = full_frames[0].shape[:-1]
-			out = cv2.VideoWriter('temp/result.avi', 
-									cv2.VideoWriter_fourcc(*'DIVX'), fps, (frame_w, frame_h))
-
-		img_batch = torch.FloatTensor(np.transpose(img_batch, (0, 3, 1, 2))).to(device)
-		mel_batch = torch.FloatTensor(np.transpose(mel_batch, (0, 3, 1, 2))).to(device)
-
+		if self.config.scheduler_max_batch and self.scheduler is None:
+			with self._scheduler_lock:
+				if self.scheduler is None:
+					self.scheduler = InferenceScheduler(self.model, self.config.device,
+														self.config.scheduler_max_batch,
+														self.config.scheduler_max_wait_ms / 1000.)
+
+	def _session(self):
+		"""Context for one job's stream of generator batches."""
+		return self.scheduler.session() if self.scheduler is not None else nullcontext()
+
+	def _predict(self, mel_batch, face_batch=None, face_feats=None):
+		"""Run one batch through the generator, or the shared scheduler.
+
+		Returns numpy predictions and the model's seconds for the batch, or
+		None for seconds when the scheduler ran it together with other jobs.
+		"""
+		if self.scheduler is not None:
+			future = self.scheduler.submit(mel_batch, face_batch, face_feats)
+			pred = future.result()
+			return pred, future.model_seconds
+
+		start = time.perf_counter()
+		mel_batch = torch.as_tensor(mel_batch).to(self.config.device, non_blocking=True)
 		with torch.no_grad():
-			pred = model(mel_batch, img_batch)
+			if face_feats is not None:
+				pred = self.model.decode(mel_batch, face_feats)
+			else:
+				pred = self.model(mel_batch, torch.as_tensor(face_batch).to(self.config.device, non_blocking=True))
+			pred = pred.cpu().numpy()
+		return pred, time.perf_counter() - start
+
+	def _paste(self, frame, pred, coords, seamless=False, copy=False):
+		"""Resize one (3, H, W) model output in [0, 1] and paste it over coords of frame."""
+		y1, y2, x1, x2 = coords
+		face = cv2.resize((pred.transpose(1, 2, 0) * 255.).astype(np.uint8), (x2 - x1, y2 - y1))
+		if copy:
+			frame = frame.copy()
+		if seamless:
+			mask = np.full(face.shape[:2], 255, dtype=np.uint8)
+			return cv2.seamlessClone(face, frame, mask, ((x1 + x2) // 2, (y1 + y2) // 2), cv2.NORMAL_CLONE)
+		frame[y1:y2, x1:x2] = face
+		return frame
+
+	def paste_batches(self, batches, timings=None, seamless=False, copy=False, metrics=None):
+		"""Yield pasted frames for (pred, frames, coords) batches, pasting on the worker pool.
+
+		The frames of one batch are resized, blended and pasted by paste_pool
+		while the next batch is pulled from batches (i.e. runs through the
+		model); output order is preserved.
+		"""
+		stats = stage_stats(metrics, 'paste_back', self.paste_workers)
+		def paste(*args):
+			start = time.perf_counter()
+			frame = self._paste(*args)
+			stats.add(busy=time.perf_counter() - start, items=1)
+			return frame
+
+		pending = deque()
+		for pred, frames, coords in batches:
+			futures = [self.paste_pool.submit(paste, f, p, c, seamless, copy)
+					   for p, f, c in zip(pred, frames, coords)]
+			while pending:
+				with stage(timings, 'paste_back'):
+					frame = pending.popleft().result()
+				yield frame
+			pending.extend(futures)
+
+		while pending:
+			with stage(timings, 'paste_back'):
+				frame = pending.popleft().result()
+			yield frame
+
+	def infer_static(self, job, mel_chunks, workspace=None, timings=None, metrics=None):
+		"""Yield lip-synced frames for a still face, one per mel chunk.
+
+		The face is detected and run through the face encoder once; every batch
+		reuses those features and only runs the audio encoder and decoder.
+		Predictions are composited onto copies of the one background frame.
+		"""
+		frame = next(self.iter_frames(job))
+		with stage(timings, 'face_detection'):
+			face, coords = self.detect_faces([frame], job, workspace)[0]
+		self._ensure_model(timings)
+
+		face_input = self._batch_buffer(1)
+		self._write_face_input(face_input[0], face)
+		face_input = torch.from_numpy(face_input).to(self.config.device)
+		# Traced / ONNX models only expose forward(); they get the broadcast input instead
+		face_feats = None
+		if hasattr(self.model, 'encode_face'):
+			with stage(timings, 'inference'), torch.no_grad():
+				face_feats = self.model.encode_face(face_input)
+
+		batch_size = self._gen_batch_size(job)
+		def predictions():
+			with self._session():
+				for start in tqdm(range(0, len(mel_chunks), batch_size)):
+					with stage(timings, 'inference'):
+						mel_batch = mel_chunks.batch(start, start + batch_size)
+						if face_feats is not None:
+							pred, seconds = self._predict(mel_batch, face_feats=face_feats)
+						else:
+							pred, seconds = self._predict(mel_batch, face_input.expand(len(mel_batch), -1, -1, -1))
+					self._observe(self._generate_stage(), frame.shape, batch_size, seconds, len(pred))
+					yield pred, [frame] * len(pred), [coords] * len(pred)
+
+		predictions = run_stage(predictions(), 'inference', self._queue_size(self.config.stage_queue_size), metrics)
+		return self.paste_batches(predictions, timings, job.seamless, copy=True, metrics=metrics)
+
+	def infer_items(self, items, mel_chunks, timings=None, batch_size=None, seamless=False, metrics=None):
+		"""Run the generator over (frame, face_crop, coords) items and yield pasted frames.
+
+		Batching, inference and paste-back run as separate stages, each up to
+		stage_queue_size batches ahead of the next.
+		"""
+		self._ensure_model(timings)
+
+		batch_size = batch_size or self._gen_batch_size()
+		queue_size = self._queue_size(self.config.stage_queue_size)
+		def predictions():
+			# Batches queued, being filled and being run must not share a buffer
+			gen = self.datagen(items, mel_chunks, batch_size, buffers=queue_size + 2)
+			gen = run_stage(gen, 'batch', queue_size, metrics)
+			with self._session():
+				for img_batch, mel_batch, frames, coords in tqdm(gen,
+														total=int(np.ceil(float(len(mel_chunks))/batch_size))):
+					with stage(timings, 'inference'):
+						pred, seconds = self._predict(mel_batch, img_batch)
+					self._observe(self._generate_stage(), frames[0].shape, batch_size, seconds, len(pred))
+					yield pred, frames, coords
+
+		predictions = run_stage(predictions(), 'inference', queue_size, metrics)
+		return self.paste_batches(predictions, timings, seamless, metrics=metrics)
+
+	def render(self, output, frames, fps, audio_path, preset='veryfast', crf=23, timings=None, metrics=None,
+			   deadline=None, cancel=None):
+		"""Pipe frames into one ffmpeg process that encodes H.264 and muxes audio_path.
+
+		Raises TimeoutError at the first frame after deadline (time.monotonic()),
+		or RuntimeError once the cancel Event is set. Either way, like any
+		other error, the encode is aborted and frames is closed.
+		"""
+		writer = None
+		stats = stage_stats(metrics, 'encode')
 
-		pred = pred.cpu().numpy().transpose(0, 2, 3, 1) * 255.
-		
-		for p, f, c in zip(pred, frames, coords):
-			y1, y2, x1, x2 = c
-			p = cv2.resize(p.astype(np.uint8), (x2 - x1, y2 - y1))
-
-			f[y1:y2, x1:x2] = p
-			out.write(f)
-
-	out.release()
-
-	command = 'ffmpeg -y -i {} -i {} -strict -2 -q:v 1 {}'.format(args.audio, 'temp/result.avi', args.outfile)
-	subprocess.call(command, shell=platform.system() != 'Windows')
+		try:
+			for f in frames:
+				if deadline is not None and time.monotonic() > deadline:
+					raise TimeoutError('Lip-sync job ran past its deadline')
+				if cancel is not None and cancel.is_set():
+					raise RuntimeError('Lip-sync job was cancelled')
+				if writer is None:
+					frame_h, frame_w = f.shape[:-1]
+					writer = FFmpegWriter(output, (frame_w, frame_h), fps, audio_path,
+											preset=preset, crf=crf)
+				start = time.perf_counter()
+				with stage(timings, 'encode'):
+					writer.write(f)
+				stats.add(busy=time.perf_counter() - start, items=1)
+
+			if writer is None:
+				raise ValueError('No frames were generated')
+			with stage(timings, 'encode'):
+				writer.close()
+		except BaseException:
+			# Close the generator chain now, so its stages stop and release their
+			# buffers instead of waiting for garbage collection
+			if hasattr(frames, 'close'):
+				frames.close()
+			if writer is not None:
+				writer.abort()
+			raise
+
+	def run(self, job, workspace=None, progress=None, deadline=None, cancel=None):
+		"""Run one lip-sync job end to end and return per-stage timings in seconds.
+
+		Intermediate files go to workspace, or to a fresh JobWorkspace that is
+		removed when the job finishes. progress, if given, is called from a
+		background thread with ProgressReporter events (frame counts, 0-1
+		progress, ETA) as the job advances. Past deadline (time.monotonic())
+		the job stops with TimeoutError as soon as its next frame is encoded,
+		and once the cancel Event is set with RuntimeError.
+		"""
+		if workspace is None:
+			with JobWorkspace(root=job.workspace_root, keep=job.keep_workspace) as workspace:
+				return self.run(job, workspace, progress, deadline, cancel)
+
+		timings = {}
+		metrics = StageMetrics()
+		job_start = time.perf_counter()
+		job = self.plan_batches(job, next(self.iter_frames(job)).shape)
+
+		if job.stream or job.static:
+			fps = self.probe_fps(job)
+		else:
+			with stage(timings, 'read_frames'):
+				full_frames, fps = self.read_frames(job)
+			print ("Number of frames available for inference: "+str(len(full_frames)))
+
+		with stage(timings, 'audio'):
+			audio_path, mel = self.load_mel(job, workspace)
+			mel_chunks = self.mel_chunks(mel, fps)
+
+		reporter = None
+		if progress is not None:
+			total_batches = -(-len(mel_chunks) // self._gen_batch_size(job))
+			reporter = ProgressReporter(metrics, progress, len(mel_chunks), total_batches).start()
+		try:
+			if job.static:
+				frames = self.infer_static(job, mel_chunks, workspace, timings, metrics)
+			elif job.stream:
+				items = self.stream_items(job, len(mel_chunks), workspace, timings, metrics)
+				# Bounded in frames: one detection batch ahead is enough to keep inference fed
+				items = run_stage(items, 'detect', self._queue_size(self._det_batch_size(job)), metrics)
+				frames = self.infer_items(items, mel_chunks, timings, self._gen_batch_size(job), job.seamless, metrics)
+			else:
+				full_frames = full_frames[:len(mel_chunks)]
+				frames = self.infer(full_frames, mel_chunks, job, workspace=workspace, timings=timings, metrics=metrics)
+			self.render(job.outfile, frames, fps, audio_path, job.preset, job.crf, timings, metrics, deadline, cancel)
+		except BaseException:
+			if reporter is not None:
+				reporter.stop(final=False)
+			raise
+		if reporter is not None:
+			reporter.stop()
+
+		timings['total'] = time.perf_counter() - job_start
+		print('Stage utilization: ' + metrics.summary())
+		for name, value in metrics.utilization().items():
+			timings[name + '_utilization'] = value
+		if self.tuner is not None:
+			self.tuner.save()
+		return timings
+
+def parse_args(argv=None):
+	return parser.parse_args(argv)
+
+def configs_from_args(args):
+	"""Split parsed CLI args into (PipelineConfig, JobConfig)."""
+	config = PipelineConfig(checkpoint_path=args.checkpoint_path, model_mode=args.model_mode,
+							wav2lip_batch_size=args.wav2lip_batch_size,
+							face_det_batch_size=args.face_det_batch_size,
+							batch_profile=args.batch_profile, paste_workers=args.paste_workers,
+							batch_workers=args.batch_workers, stage_queue_size=args.stage_queue_size,
+							scheduler_max_batch=args.scheduler_max_batch,
+							scheduler_max_wait_ms=args.scheduler_max_wait_ms,
+							face_cache_dir=args.face_cache_dir,
+							mel_cache_dir=args.mel_cache_dir)
+	job = JobConfig(face=args.face, audio=args.audio, outfile=args.outfile, static=args.static,
+					fps=args.fps, pads=tuple(args.pads), resize_factor=args.resize_factor,
+					crop=tuple(args.crop), box=tuple(args.box), rotate=args.rotate,
+					nosmooth=args.nosmooth, seamless=args.seamless, detect_short_side=args.detect_short_side,
+					detect_every=args.detect_every,
+					motion_threshold=args.motion_threshold, keyframe_iou=args.keyframe_iou,
+					stream=args.stream, preset=args.preset, crf=args.crf,
+					workspace_root=args.tmpdir, keep_workspace=args.keep_workspace)
+	return config, job
+
+def main(argv=None):
+	config, job = configs_from_args(parse_args(argv))
+	print('Using {} for inference.'.format(config.device))
+	# The model and detector load lazily, so a fully cached job never builds S3FD
+	Wav2LipPipeline(config).run(job)
 
 if __name__ == '__main__':
 	main()
@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+import torch
+
+class _Request:
+	def __init__(self, mel_batch, face_batch, face_feats):
+		self.mel_batch = mel_batch
+		self.face_batch = face_batch
+		self.face_feats = face_feats
+		self.future = Future()
+
+	def __len__(self):
+		return len(self.mel_batch)
+
+class InferenceScheduler:
+	"""Runs one loaded Wav2Lip model for many concurrent jobs, coalescing their batches.
+
+	Jobs submit (mel_batch, face_batch) requests, or (mel_batch, face_feats)
+	for a still face encoded once with encode_face(). A single thread takes
+	the oldest request, waits up to max_wait seconds for requests from the
+	other jobs in a session() until max_batch samples are queued, runs them
+	all as one pass through the model and resolves each request's Future with
+	its slice of the (B, 3, H, W) numpy predictions. A lone job is never kept
+	waiting, and a request larger than max_batch runs on its own. Each
+	Future's model_seconds is the model time of its pass when the request ran
+	alone, and None when the pass was shared with other requests.
+
+	Inputs may be numpy arrays or tensors and must stay unchanged until the
+	request's Future is done.
+	"""
+
+	def __init__(self, model, device, max_batch=128, max_wait=0.01):
+		self.model = model
+		self.device = device
+		self.max_batch = max_batch
+		self.max_wait = max_wait
+		self.requests = queue.Queue()
+		self.lock = threading.Lock()
+		self.sessions = 0
+		self.batches = 0
+		self.samples = 0
+		self.worker = threading.Thread(target=self._loop, name='wav2lip-scheduler', daemon=True)
+		self.worker.start()
+
+	@contextmanager
+	def session(self):
+		"""Mark a job as active, so batches wait for its requests instead of running alone."""
+		with self.lock:
+			self.sessions += 1
+		try:
+			yield self
+		finally:
+			with self.lock:
+				self.sessions -= 1
+
+	def submit(self, mel_batch, face_batch=None, face_feats=None):
+		if (face_batch is None) == (face_feats is None):
+			raise ValueError('Pass exactly one of face_batch and face_feats')
+		request = _Request(mel_batch, face_batch, face_feats)
+		self.requests.put(request)
+		return request.future
+
+	def run(self, mel_batch, face_batch=None, face_feats=None):
+		"""Submit one batch and wait for its predictions."""
+		return self.submit(mel_batch, face_batch, face_feats).result()
+
+	def mean_batch_size(self):
+		return self.samples / self.batches if self.batches else 0.
+
+	def _gather(self, first):
+		"""first plus whatever other requests arrive in time, and the request left over (if any)."""
+		group, size = [first], len(first)
+		deadline = time.perf_counter() + self.max_wait
+		while size < self.max_batch:
+			with self.lock:
+				if len(group) >= self.sessions:
+					break
+			timeout = deadline - time.perf_counter()
+			if timeout <= 0:
+				break
+			try:
+				request = self.requests.get(timeout=timeout)
+			except queue.Empty:
+				break
+			if size + len(request) > self.max_batch:
+				return group, request
+			group.append(request)
+			size += len(request)
+		return group, None
+
+	def _loop(self):
+		pending = None
+		while 1:
+			request = pending if pending is not None else self.requests.get()
+			group, pending = self._gather(request)
+			start = time.perf_counter()
+			try:
+				with torch.no_grad():
+					pred = self._predict(group)
+			except BaseException as e:
+				for request in group:
+					request.future.set_exception(e)
+				continue
+			seconds = time.perf_counter() - start if len(group) == 1 else None
+			self.batches += 1
+			self.samples += len(pred)
+			start = 0
+			for request in group:
+				request.future.model_seconds = seconds
+				request.future.set_result(pred[start:start + len(request)])
+				start += len(request)
+
+	def _tensor(self, x):
+		return torch.as_tensor(x).to(self.device, non_blocking=True)
+
+	def _cat(self, arrays):
+		if len(arrays) == 1:
+			return self._tensor(arrays[0])
+		return self._tensor(torch.cat([torch.as_tensor(x) for x in arrays]))
+
+	def _predict(self, group):
+		mel_batch = self._cat([r.mel_batch for r in group])
+		if all(r.face_feats is None for r in group):
+			return self.model(mel_batch, self._cat([r.face_batch for r in group])).cpu().numpy()
+
+		if len(group) == 1:
+			return self.model.decode(mel_batch, group[0].face_feats).cpu().numpy()
+
+		# Several still faces, or a mix with full inputs: one decode over per-sample features
+		encoded = [r for r in group if r.face_feats is None]
+		if encoded:
+			encoded_feats = self.model.encode_face(self._cat([r.face_batch for r in encoded]))
+		parts, offset = [], 0
+		for r in group:
+			if r.face_feats is None:
+				parts.append([f[offset:offset + len(r)] for f in encoded_feats])
+				offset += len(r)
+			else:
+				parts.append([f.expand(len(r), -1, -1, -1) for f in r.face_feats])
+		feats = [torch.cat(level) for level in zip(*parts)]
+		return self.model.decode(mel_batch, feats).cpu().numpy()
@@ -0,0 +1,114 @@
+import os
+import hashlib
+import subprocess
+import tempfile
+import numpy as np
+from scipy.io import wavfile
+
+import audio
+from face_cache import file_digest
+from hparams import hparams as hp
+
+DEFAULT_CACHE_DIR = os.getenv('WAV2LIP_MEL_CACHE',
+								os.path.join(os.path.expanduser('~'), '.cache', 'wav2lip', 'mels'))
+DEFAULT_MAX_MB = int(os.getenv('WAV2LIP_MEL_CACHE_MB', 512))
+
+# Bump when audio.melspectrogram or the audio hparams change
+MEL_VERSION = 'mel-1'
+
+class MelCache:
+	"""On-disk cache of the Wav2Lip audio front-end, keyed by audio content.
+
+	For every audio file it keeps a 16 kHz mono PCM wav and its mel
+	spectrogram as <key>.wav / <key>.npy. The TTS endpoint fills it as soon as
+	speech is generated, so the lip-sync job on the same audio skips the
+	ffmpeg conversion, librosa resampling and STFT. Entries are trimmed least
+	recently used first once the directory grows past max_bytes.
+	"""
+
+	def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+					ffmpeg_bin='ffmpeg'):
+		self.root = root
+		self.max_bytes = max_bytes
+		self.ffmpeg_bin = ffmpeg_bin
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(root, exist_ok=True)
+
+	def key(self, audio_path):
+		parts = [MEL_VERSION, str(hp.sample_rate), file_digest(audio_path)]
+		return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+	def _path(self, key, ext):
+		return os.path.join(self.root, key + ext)
+
+	def get(self, audio_path):
+		"""Return (wav_path, mel) for audio_path if cached, else None."""
+		key = self.key(audio_path)
+		wav_path, mel_path = self._path(key, '.wav'), self._path(key, '.npy')
+		try:
+			mel = np.load(mel_path)
+			if not os.path.isfile(wav_path):
+				raise OSError(wav_path)
+			os.utime(mel_path)
+			os.utime(wav_path)
+		except (OSError, ValueError):
+			self.misses += 1
+			return None
+		self.hits += 1
+		return wav_path, mel
+
+	def prepare(self, audio_path):
+		"""Return (wav_path, mel) for audio_path, decoding and caching it on a miss."""
+		cached = self.get(audio_path)
+		if cached is not None:
+			return cached
+
+		key = self.key(audio_path)
+		wav_path, mel_path = self._path(key, '.wav'), self._path(key, '.npy')
+
+		fd, tmp_wav = tempfile.mkstemp(dir=self.root, suffix='.tmp.wav')
+		os.close(fd)
+		command = [self.ffmpeg_bin, '-y', '-loglevel', 'error', '-i', audio_path,
+					'-ac', '1', '-ar', str(hp.sample_rate), '-c:a', 'pcm_s16le', tmp_wav]
+		result = subprocess.run(command, stderr=subprocess.PIPE)
+		if result.returncode != 0:
+			os.remove(tmp_wav)
+			raise RuntimeError('ffmpeg failed decoding {}: {}'.format(
+				audio_path, result.stderr.decode(errors='replace').strip() or 'no output'))
+
+		_, pcm = wavfile.read(tmp_wav)
+		mel = audio.melspectrogram(pcm.astype(np.float32) / 32768.)
+
+		fd, tmp_mel = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+		with os.fdopen(fd, 'wb') as f:
+			np.save(f, mel)
+		os.replace(tmp_wav, wav_path)
+		os.replace(tmp_mel, mel_path)
+		self.evict()
+		return wav_path, mel
+
+	def evict(self):
+		"""Delete least recently used entries until the cache fits in max_bytes."""
+		entries = {}
+		for name in os.listdir(self.root):
+			key, ext = os.path.splitext(name)
+			if ext not in ('.wav', '.npy') or key.endswith('.tmp'):
+				continue
+			try:
+				stat = os.stat(os.path.join(self.root, name))
+			except OSError:
+				continue
+			mtime, size = entries.get(key, (0, 0))
+			entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size)
+
+		total = sum(size for _, size in entries.values())
+		for key, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+			if total <= self.max_bytes:
+				break
+			for ext in ('.wav', '.npy'):
+				try:
+					os.remove(self._path(key, ext))
+				except OSError:
+					pass
+			total -= size
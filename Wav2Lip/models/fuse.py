@@ -0,0 +1,28 @@
+import copy
+import torch
+from torch import nn
+
+def fuse_conv_bn(conv, bn):
+    """Return a copy of conv with the eval-mode BatchNorm bn folded into its weights and bias."""
+    fused = copy.deepcopy(conv)
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+
+    # Output channels are dim 0 of a Conv2d weight but dim 1 of a ConvTranspose2d weight
+    shape = [1] * conv.weight.dim()
+    shape[1 if isinstance(conv, nn.ConvTranspose2d) else 0] = -1
+    bias = conv.bias if conv.bias is not None else torch.zeros_like(bn.running_mean)
+
+    with torch.no_grad():
+        fused.weight.copy_(conv.weight * scale.reshape(shape))
+        fused.bias = nn.Parameter((bias - bn.running_mean) * scale + bn.bias)
+    return fused
+
+def fuse_batchnorm(model):
+    """Fold every conv_block's BatchNorm into its conv, in place. Only valid in eval mode."""
+    blocks = [module for module in model.modules()
+              if isinstance(getattr(module, 'conv_block', None), nn.Sequential)]
+    for module in blocks:
+        block = module.conv_block
+        if len(block) == 2 and isinstance(block[1], nn.BatchNorm2d):
+            module.conv_block = nn.Sequential(fuse_conv_bn(block[0], block[1]))
+    return model
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import torch
+
+from face_cache import file_digest
+from models import Wav2Lip
+from models.fuse import fuse_batchnorm
+from quantization import BFloat16Wav2Lip, load_int8
+
+MODES = ['eager', 'fused', 'jit', 'compile', 'onnx', 'int8', 'bf16']
+
+# Bump when the export steps below change what gets written
+EXPORT_VERSION = 1
+
+def artifact_path(checkpoint_path, mode):
+	"""Where the mode's optimized artifact for a checkpoint lives: next to it, keyed by its hash."""
+	root = os.path.splitext(checkpoint_path)[0]
+	ext = '.onnx' if mode == 'onnx' else '.pt'
+	return '{}.{}.v{}.{}{}'.format(root, file_digest(checkpoint_path)[:16], EXPORT_VERSION, mode, ext)
+
+def save_atomic(path, save_fn):
+	"""Write path via save_fn(tmp_path); an unwritable model dir only costs the cache."""
+	tmp = None
+	try:
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+		os.close(fd)
+		save_fn(tmp)
+		os.replace(tmp, path)
+	except OSError as e:
+		print('Could not cache optimized model at {}: {}'.format(path, e))
+		if tmp is not None and os.path.exists(tmp):
+			os.remove(tmp)
+
+def _example_inputs(device, batch_size=2):
+	return (torch.zeros(batch_size, 1, 80, 16, device=device),
+			torch.zeros(batch_size, 6, 96, 96, device=device))
+
+def load_fused(checkpoint_path, device, load_eager):
+	"""Wav2Lip with every BatchNorm folded into the preceding conv."""
+	path = artifact_path(checkpoint_path, 'fused')
+	if os.path.isfile(path):
+		model = fuse_batchnorm(Wav2Lip().eval())
+		model.load_state_dict(torch.load(path, map_location='cpu'))
+		return model.to(device).eval()
+
+	model = fuse_batchnorm(load_eager().eval())
+	save_atomic(path, lambda tmp: torch.save(model.state_dict(), tmp))
+	return model
+
+def load_jit(checkpoint_path, device, load_eager):
+	"""Frozen TorchScript trace of the fused model. Only forward() survives tracing."""
+	path = artifact_path(checkpoint_path, 'jit')
+	if os.path.isfile(path):
+		return torch.jit.load(path, map_location=device).eval()
+
+	model = load_fused(checkpoint_path, device, load_eager)
+	with torch.no_grad():
+		traced = torch.jit.freeze(torch.jit.trace(model, _example_inputs(device)))
+	save_atomic(path, lambda tmp: torch.jit.save(traced, tmp))
+	return traced
+
+class OnnxWav2Lip:
+	"""Callable stand-in for the Wav2Lip generator backed by an onnxruntime CPU session."""
+
+	def __init__(self, path):
+		import onnxruntime # Optional dependency, only needed for --model_mode onnx
+		self.session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+	def __call__(self, mel_batch, img_batch):
+		pred, = self.session.run(None, {'mel': mel_batch.cpu().numpy(), 'face': img_batch.cpu().numpy()})
+		return torch.from_numpy(pred)
+
+	def eval(self):
+		return self
+
+def load_onnx(checkpoint_path, load_eager):
+	path = artifact_path(checkpoint_path, 'onnx')
+	if not os.path.isfile(path):
+		model = load_fused(checkpoint_path, 'cpu', load_eager).cpu()
+		save_atomic(path, lambda tmp: torch.onnx.export(model, _example_inputs('cpu'), tmp,
+							input_names=['mel', 'face'], output_names=['pred'], opset_version=17,
+							dynamic_axes={'mel': {0: 'batch'}, 'face': {0: 'batch'}, 'pred': {0: 'batch'}}))
+	return OnnxWav2Lip(path)
+
+def load(checkpoint_path, device, mode, load_eager):
+	"""Load Wav2Lip in one of MODES, building and caching the optimized artifact on first use.
+
+	load_eager() must return the plain eval-mode model for checkpoint_path.
+	jit and onnx models only expose forward(), so callers must not rely on
+	encode_face()/decode() with them.
+	"""
+	if mode == 'eager':
+		return load_eager()
+	if mode == 'fused':
+		return load_fused(checkpoint_path, device, load_eager)
+	if mode == 'compile':
+		return torch.compile(load_fused(checkpoint_path, device, load_eager))
+	if mode == 'jit':
+		return load_jit(checkpoint_path, device, load_eager)
+	if mode == 'onnx':
+		if device != 'cpu':
+			raise ValueError('--model_mode onnx runs on CPU only')
+		return load_onnx(checkpoint_path, load_eager)
+	if mode == 'bf16':
+		return BFloat16Wav2Lip(load_fused(checkpoint_path, device, load_eager))
+	if mode == 'int8':
+		if device != 'cpu':
+			raise ValueError('--model_mode int8 runs on CPU only')
+		path = artifact_path(checkpoint_path, 'int8')
+		if not os.path.isfile(path):
+			raise FileNotFoundError('No int8 calibration for {}; run calibrate_quantization.py '
+									'--checkpoint_path {} first'.format(checkpoint_path, checkpoint_path))
+		return load_int8(path)
+	raise ValueError('Unknown model mode {!r}; expected one of {}'.format(mode, ', '.join(MODES)))
@@ -0,0 +1,91 @@
+import copy
+import warnings
+import torch
+from torch import nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from models import Wav2Lip
+from models.fuse import fuse_batchnorm
+
+BACKEND = 'x86'
+
+def block_names(model):
+	"""Names of the Wav2Lip submodules that are quantized one by one."""
+	return (['audio_encoder'] +
+			['face_encoder_blocks.{}'.format(i) for i in range(len(model.face_encoder_blocks))] +
+			['face_decoder_blocks.{}'.format(i) for i in range(len(model.face_decoder_blocks))] +
+			['output_block'])
+
+def _set_block(model, name, block):
+	parent, _, child = name.rpartition('.')
+	setattr(model.get_submodule(parent) if parent else model, child, block)
+
+def _block_inputs(model, mel_batch, img_batch):
+	inputs, hooks = {}, []
+	for name in block_names(model):
+		hook = lambda module, args, name=name: inputs.setdefault(name, args)
+		hooks.append(model.get_submodule(name).register_forward_pre_hook(hook))
+	with torch.no_grad():
+		model(mel_batch, img_batch)
+	for hook in hooks:
+		hook.remove()
+	return inputs
+
+def _prepare(model, mel_batch, img_batch):
+	torch.backends.quantized.engine = BACKEND
+	qconfig_mapping = get_default_qconfig_mapping(BACKEND)
+	inputs = _block_inputs(model, mel_batch, img_batch)
+	for name in block_names(model):
+		_set_block(model, name, prepare_fx(model.get_submodule(name), qconfig_mapping, inputs[name]))
+	return model
+
+def _convert(model):
+	for name in block_names(model):
+		_set_block(model, name, convert_fx(model.get_submodule(name)))
+	return model
+
+def quantize_int8(model, calibration_batches):
+	"""Post-training static int8 quantization of a BatchNorm-fused Wav2Lip.
+
+	Each encoder/decoder block is quantized on its own: forward() and decode()
+	have shape-dependent Python control flow that FX cannot trace, so the skip
+	concatenations between blocks stay in float. calibration_batches yields
+	(mel_batch, img_batch) float tensors like the ones datagen produces.
+	"""
+	model = copy.deepcopy(model).cpu().eval()
+	batches = iter(calibration_batches)
+	first = next(batches)
+	_prepare(model, *first)
+	with torch.no_grad():
+		model(*first)
+		for mel_batch, img_batch in batches:
+			model(mel_batch, img_batch)
+	return _convert(model)
+
+def load_int8(path):
+	"""Rebuild the int8 structure and load a state dict saved from quantize_int8()."""
+	model = fuse_batchnorm(Wav2Lip().eval())
+	_prepare(model, torch.zeros(1, 1, 80, 16), torch.zeros(1, 6, 96, 96))
+	with warnings.catch_warnings():
+		# Observers are empty here; their placeholder qparams are overwritten below
+		warnings.simplefilter('ignore')
+		_convert(model)
+	model.load_state_dict(torch.load(path, map_location='cpu'))
+	return model
+
+class BFloat16Wav2Lip(nn.Module):
+	"""Runs a Wav2Lip in bfloat16 behind the float32 interface the pipeline uses."""
+
+	def __init__(self, model):
+		super().__init__()
+		self.model = model.to(torch.bfloat16)
+
+	def forward(self, mel_batch, img_batch):
+		return self.model(mel_batch.bfloat16(), img_batch.bfloat16()).float()
+
+	def encode_face(self, face_sequences):
+		return self.model.encode_face(face_sequences.bfloat16())
+
+	def decode(self, audio_sequences, feats):
+		return self.model.decode(audio_sequences.bfloat16(), feats).float()
@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+
+# Per-thread seconds spent waiting on an upstream stage's queue since the last item
+_local = threading.local()
+
+class StageStats:
+	"""Seconds one pipeline stage spent working (busy), waiting for input
+	(starved) and waiting for room in its output queue (blocked)."""
+
+	def __init__(self, name, workers=1):
+		self.name = name
+		self.workers = workers
+		self.busy = 0.
+		self.starved = 0.
+		self.blocked = 0.
+		self.items = 0
+		self.lock = threading.Lock()
+
+	def add(self, busy=0., starved=0., blocked=0., items=0):
+		with self.lock:
+			self.busy += busy
+			self.starved += starved
+			self.blocked += blocked
+			self.items += items
+
+class StageMetrics:
+	"""StageStats of every stage of one job.
+
+	Utilization is busy time over the job's wall-clock time times the
+	stage's worker count: the stage closest to 1 is the bottleneck, the
+	others mostly wait on it.
+	"""
+
+	def __init__(self):
+		self.start = time.perf_counter()
+		self.stages = {}
+		self.lock = threading.Lock()
+
+	def stage(self, name, workers=1):
+		with self.lock:
+			if name not in self.stages:
+				self.stages[name] = StageStats(name, workers)
+			return self.stages[name]
+
+	def utilization(self):
+		wall = time.perf_counter() - self.start
+		return {name: stats.busy / (wall * stats.workers) if wall > 0 else 0.
+				for name, stats in self.stages.items()}
+
+	def summary(self):
+		return ', '.join('{} {:.0%}'.format(name, value) for name, value in self.utilization().items())
+
+def stage_stats(metrics, name, workers=1):
+	"""metrics.stage(name, workers), or a throwaway StageStats when metrics is None."""
+	if metrics is None:
+		return StageStats(name, workers)
+	return metrics.stage(name, workers)
+
+def _get(buffer):
+	start = time.perf_counter()
+	entry = buffer.get()
+	if hasattr(_local, 'starved'):
+		_local.starved += time.perf_counter() - start
+	return entry
+
+def run_stage(iterable, name, maxsize, metrics=None):
+	"""Produce iterable on its own thread, handing items over a queue of at most maxsize.
+
+	Chaining run_stage calls gives a pipeline whose stages work concurrently,
+	each at most maxsize items ahead of the next. Exceptions are re-raised in
+	the consumer; closing the consumer stops the thread and closes iterable.
+	With maxsize 0 the stage runs inline on the consumer's thread.
+	"""
+	if maxsize <= 0:
+		return iterable
+	return _threaded(iterable, maxsize, stage_stats(metrics, name))
+
+def _threaded(iterable, maxsize, stats):
+	buffer = queue.Queue(maxsize)
+	stop = threading.Event()
+	done = object()
+
+	def put(item):
+		while not stop.is_set():
+			try:
+				buffer.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	def produce():
+		_local.starved = 0.
+		iterator = iter(iterable)
+		try:
+			while 1:
+				start = time.perf_counter()
+				try:
+					item = next(iterator)
+				except StopIteration:
+					break
+				produced = time.perf_counter()
+				if not put((None, item)):
+					return
+				stats.add(busy=produced - start - _local.starved, starved=_local.starved,
+						  blocked=time.perf_counter() - produced, items=1)
+				_local.starved = 0.
+		except Exception as e:
+			put((e, None))
+			return
+		finally:
+			if hasattr(iterator, 'close'):
+				iterator.close()
+		put((None, done))
+
+	worker = threading.Thread(target=produce, name='wav2lip-' + stats.name, daemon=True)
+	worker.start()
+	try:
+		while 1:
+			error, item = _get(buffer)
+			if error is not None:
+				raise error
+			if item is done:
+				return
+			yield item
+	finally:
+		stop.set()
+
+class ProgressReporter:
+	"""Reports a job's progress from its StageMetrics to callback(event) on a background thread.
+
+	Every interval seconds, if any stage moved, callback gets a dict with the
+	frames decoded, faces detected, batches inferred and frames encoded so
+	far (keys of stages that run inline are omitted), the overall progress
+	(encoded / total frames, 0-1) and an ETA in seconds extrapolated from the
+	encode rate. An unchanged event is still repeated every heartbeat seconds,
+	so a job busy in one long step is not mistaken for a stalled one. stop()
+	sends a final event when the job succeeded.
+	"""
+
+	COUNTERS = {'decode': 'frames_decoded', 'detect': 'faces_detected',
+				'inference': 'batches_inferred', 'encode': 'frames_encoded'}
+
+	def __init__(self, metrics, callback, total_frames, total_batches, interval=1., heartbeat=30.):
+		self.metrics = metrics
+		self.callback = callback
+		self.total_frames = total_frames
+		self.total_batches = total_batches
+		self.interval = interval
+		self.heartbeat = heartbeat
+		self.first_encode = None
+		self.stop_event = threading.Event()
+		self.thread = threading.Thread(target=self._loop, name='wav2lip-progress', daemon=True)
+
+	def event(self):
+		now = time.perf_counter()
+		event = {'stage': 'lipsync', 'total_frames': self.total_frames, 'total_batches': self.total_batches,
+				 'elapsed': now - self.metrics.start}
+		for name, key in self.COUNTERS.items():
+			if name in self.metrics.stages:
+				event[key] = self.metrics.stages[name].items
+		encoded = event.get('frames_encoded', 0)
+		if encoded and self.first_encode is None:
+			self.first_encode = (now, encoded)
+		event['progress'] = min(1., encoded / self.total_frames) if self.total_frames else 0.
+		event['eta'] = None
+		if self.first_encode is not None and encoded > self.first_encode[1]:
+			rate = (encoded - self.first_encode[1]) / (now - self.first_encode[0])
+			event['eta'] = (self.total_frames - encoded) / rate
+		return event
+
+	def _loop(self):
+		last, last_sent = None, time.perf_counter()
+		while not self.stop_event.wait(self.interval):
+			event = self.event()
+			counts = tuple(event.get(key) for key in self.COUNTERS.values())
+			if counts != last or time.perf_counter() - last_sent >= self.heartbeat:
+				last, last_sent = counts, time.perf_counter()
+				self.callback(event)
+
+	def start(self):
+		self.callback(self.event())
+		self.thread.start()
+		return self
+
+	def stop(self, final=True):
+		self.stop_event.set()
+		self.thread.join()
+		if final:
+			event = self.event()
+			event.update(progress=1., eta=0.)
+			self.callback(event)
@@ -0,0 +1,63 @@
+import subprocess
+import numpy as np
+
+class FFmpegWriter:
+	"""Encode raw BGR frames to H.264 and mux audio in a single ffmpeg process.
+
+	Frames are written to ffmpeg's stdin as they are produced, so there is no
+	intermediate video file and no second encode pass.
+	"""
+
+	def __init__(self, output, size, fps, audio_path=None, preset='veryfast', crf=23,
+					ffmpeg_bin='ffmpeg'):
+		width, height = size
+		self.output = output
+		self.command = [ffmpeg_bin, '-y', '-loglevel', 'error',
+						'-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', '{}x{}'.format(width, height),
+						'-r', str(fps), '-i', 'pipe:0']
+		if audio_path is not None:
+			self.command += ['-i', audio_path]
+		self.command += ['-map', '0:v:0']
+		if audio_path is not None:
+			self.command += ['-map', '1:a:0', '-c:a', 'aac', '-shortest']
+		# libx264 with yuv420p needs even dimensions
+		self.command += ['-c:v', 'libx264', '-preset', preset, '-crf', str(crf),
+						'-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+						'-movflags', '+faststart', output]
+		self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+		self.frames_written = 0
+
+	def write(self, frame):
+		try:
+			self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+		except BrokenPipeError:
+			self._raise_failure()
+		self.frames_written += 1
+
+	def close(self):
+		if self.process.stdin and not self.process.stdin.closed:
+			try:
+				self.process.stdin.close()
+			except BrokenPipeError:
+				pass
+		if self.process.wait() != 0:
+			self._raise_failure()
+
+	def abort(self):
+		if self.process.poll() is None:
+			self.process.kill()
+		self.process.wait()
+
+	def _raise_failure(self):
+		self.process.wait()
+		error = self.process.stderr.read().decode(errors='replace').strip()
+		raise RuntimeError('ffmpeg failed writing {}: {}'.format(self.output, error or 'no output'))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if exc_type is None:
+			self.close()
+		else:
+			self.abort()
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+TMPFS_ROOT = '/dev/shm'
+TMPFS_MIN_FREE = 512 * 1024 * 1024
+
+def default_root():
+	"""Pick where job workspaces live: $WAV2LIP_TMPDIR, then tmpfs if roomy, then the system temp dir."""
+	root = os.getenv('WAV2LIP_TMPDIR')
+	if root:
+		return root
+	if os.path.isdir(TMPFS_ROOT) and os.access(TMPFS_ROOT, os.W_OK):
+		if shutil.disk_usage(TMPFS_ROOT).free >= TMPFS_MIN_FREE:
+			return TMPFS_ROOT
+	return tempfile.gettempdir()
+
+class JobWorkspace:
+	"""Scratch directory private to one lip-sync job.
+
+	Every intermediate file of a job (converted audio, debug frames) lives in
+	here, so concurrent jobs in one process or one cwd never collide. The
+	directory is removed on exit unless keep is set.
+	"""
+
+	def __init__(self, root=None, prefix='wav2lip_', keep=False):
+		root = root or default_root()
+		os.makedirs(root, exist_ok=True)
+		self.dir = tempfile.mkdtemp(prefix=prefix, dir=root)
+		self.keep = keep
+
+	def path(self, name):
+		return os.path.join(self.dir, name)
+
+	def cleanup(self):
+		shutil.rmtree(self.dir, ignore_errors=True)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		if self.keep:
+			print('Keeping job workspace: {}'.format(self.dir))
+		else:
+			self.cleanup()
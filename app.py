@@ -1,15 +1,22 @@
-from flask import Flask, request, jsonify, send_from_directory, url_for, render_template
+from flask import Flask, request, jsonify, send_from_directory, url_for, render_template, Response, stream_with_context
 from flask_cors import CORS
 from modules.image_gen import generate_image
 from modules.video_creator import create_video
 from modules.lipsync import run_lipsync
+from modules.lipsync_engine import get_engine as get_lipsync_engine, prepare_audio as prepare_lipsync_audio
+from modules.job_queue import (
+    JobQueue, JobWorkerPool, JOB_WORKERS_ENV, JOB_TIMEOUT_ENV, DEFAULT_JOB_TIMEOUT,
+    JOB_STALL_TIMEOUT_ENV, DEFAULT_STALL_TIMEOUT
+)
+from modules.tts_cache import TTSCache
+from modules.coqui_pool import get_pool as get_coqui_pool, COQUI_PRELOAD_ENV
 from dotenv import load_dotenv
 from datetime import datetime
 from gtts import gTTS
-from TTS.api import TTS
 from PIL import Image, ImageDraw, ImageFont
 from werkzeug.utils import secure_filename
 import os
+import json
 import requests
 import gdown
 import logging
@@ -20,7 +27,7 @@ import asyncio
 import signal
 import time
 from logging.handlers import RotatingFileHandler
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
 from utils.path_manager import path_manager
 from pathlib import Path
 import traceback
@@ -688,6 +695,54 @@ for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, TEMP_FOLDER, 'models',
                AUDIO_FOLDER, 'static/images', COQUI_MODEL_DIR, VOICE_PREVIEWS]:
     os.makedirs(folder, exist_ok=True)
 
+# Synthesized speech is reused for repeated (text, voice, engine) requests
+tts_cache = TTSCache()
+
+# Video renders run as queued jobs. Each web process starts VIDEO_JOB_WORKERS worker
+# processes on first use; set it to 0 when running `python -m modules.job_queue` separately
+# (start.sh does, so job workers outlive web worker restarts).
+video_jobs = JobQueue()
+VIDEO_JOB_WORKERS = int(os.getenv(JOB_WORKERS_ENV, 1))
+VIDEO_JOB_TIMEOUT = float(os.getenv(JOB_TIMEOUT_ENV, DEFAULT_JOB_TIMEOUT))
+VIDEO_JOB_STALL_TIMEOUT = float(os.getenv(JOB_STALL_TIMEOUT_ENV, DEFAULT_STALL_TIMEOUT))
+# SSE clients are warned after this long without progress, well before the job is failed
+VIDEO_JOB_STALL_WARNING = 60
+# Each SSE connection ends well inside gunicorn's 30 s worker timeout; browsers reconnect
+# after VIDEO_JOB_SSE_RETRY_MS, and the page falls back to polling if they can't
+VIDEO_JOB_SSE_MAX_SECONDS = 20
+VIDEO_JOB_SSE_RETRY_MS = 1000
+_video_job_pool = None
+_video_job_pool_lock = threading.Lock()
+
+def ensure_video_workers():
+    """Start this process's video job workers if configured and not running yet."""
+    global _video_job_pool
+    with _video_job_pool_lock:
+        if _video_job_pool is None and VIDEO_JOB_WORKERS > 0:
+            _video_job_pool = JobWorkerPool(
+                video_jobs.db_path,
+                {"video": "app:process_video_job"},
+                processes=VIDEO_JOB_WORKERS,
+                timeout=VIDEO_JOB_TIMEOUT,
+                stall_timeout=VIDEO_JOB_STALL_TIMEOUT,
+                initializer="app:init_video_worker"
+            ).start()
+
+def init_video_worker():
+    """Job worker startup: load Wav2Lip (or wait for the shared lip-sync worker) before the first job.
+
+    Set LIPSYNC_PRELOAD=false to load lazily on the first lip-sync job instead.
+    """
+    if os.getenv("LIPSYNC_PRELOAD", "true").lower() == "true":
+        get_lipsync_engine(MODEL_PATH).load()
+
+def coqui_preload_models():
+    """Coqui models named by COQUI_PRELOAD: a comma-separated list, or "fallbacks" for every coqui_fallback."""
+    setting = os.getenv(COQUI_PRELOAD_ENV, "").strip()
+    if setting.lower() == "fallbacks":
+        return sorted({v['coqui_fallback'] for voices in VOICES.values() for v in voices if 'coqui_fallback' in v})
+    return [name.strip() for name in setting.split(",") if name.strip()]
+
 def download_wav2lip_model():
     if os.path.exists(MODEL_PATH) and os.path.getsize(MODEL_PATH) > 100_000_000:
         logger.info("Wav2Lip model already exists")
@@ -709,24 +764,6 @@ def download_wav2lip_model():
             os.remove(MODEL_PATH)
         raise
 
-def save_audio_file(audio_data, voice_id, extension="wav"):
-    try:
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"tts_{voice_id}_{timestamp}.{extension}"
-        filepath = os.path.join(AUDIO_FOLDER, filename)
-        
-        with open(filepath, 'wb') as f:
-            f.write(audio_data)
-        
-        return {
-            "status": "success",
-            "audio_url": f"/static/audio/{filename}",
-            "filepath": filepath
-        }
-    except Exception as e:
-        logger.error(f"Error saving audio file: {str(e)}")
-        return {"status": "error", "message": str(e)}
-
 async def async_generate_with_edge(text, voice_id):
     try:
         communicate = edge_tts.Communicate(text, voice_id)
@@ -752,14 +789,7 @@ def generate_with_edge(text, voice_id):
 
 def generate_with_coqui(text, model_name):
     try:
-        tts = TTS(model_name=f"tts_models/{model_name}")
-        temp_file = os.path.join(TEMP_FOLDER, f"coqui_{datetime.now().strftime('%Y%m%d%H%M%S')}.wav")
-        tts.tts_to_file(text=text, file_path=temp_file)
-        
-        with open(temp_file, 'rb') as f:
-            audio_data = f.read()
-        os.remove(temp_file)
-        return audio_data
+        return get_coqui_pool().synthesize(model_name, text)
     except Exception as e:
         logger.error(f"Coqui TTS error: {str(e)}")
         return None
@@ -837,44 +867,52 @@ def generate_tts():
         if not selected_voice:
             return jsonify({'status': 'error', 'message': 'Invalid voice selection'}), 400
 
-        # Determine service to use
+        # Determine service to use, then the fallbacks in order
         service = selected_voice.get('service', 'edge')
-        audio_data = None
-        
+        attempts = []
         if service == 'edge' and selected_voice.get('id'):
-            audio_data = generate_with_edge(text, selected_voice['id'])
+            attempts.append(('edge', selected_voice['id'], selected_voice['name'],
+                             lambda: generate_with_edge(text, selected_voice['id'])))
         elif service == 'coqui' and selected_voice.get('coqui_model'):
-            audio_data = generate_with_coqui(text, selected_voice['coqui_model'])
-        
-        # Fallback system
-        if not audio_data:
-            if service == 'edge' and 'coqui_fallback' in selected_voice:
-                logger.info(f"Falling back to Coqui: {selected_voice['coqui_fallback']}")
-                audio_data = generate_with_coqui(text, selected_voice['coqui_fallback'])
-                if audio_data:
-                    selected_voice['name'] += " (Coqui Fallback)"
-            
-            if not audio_data:
-                logger.info("Falling back to gTTS")
-                lang_code = GTTS_LANG_CODES.get(language, "en")
-                audio_data = generate_with_gtts(text, lang=lang_code)
-                if audio_data:
-                    selected_voice['name'] += " (gTTS Fallback)"
+            attempts.append(('coqui', selected_voice['coqui_model'], selected_voice['name'],
+                             lambda: generate_with_coqui(text, selected_voice['coqui_model'])))
+        if service == 'edge' and 'coqui_fallback' in selected_voice:
+            attempts.append(('coqui', selected_voice['coqui_fallback'], f"{selected_voice['name']} (Coqui Fallback)",
+                             lambda: generate_with_coqui(text, selected_voice['coqui_fallback'])))
+        lang_code = GTTS_LANG_CODES.get(language, "en")
+        attempts.append(('gtts', lang_code, f"{selected_voice['name']} (gTTS Fallback)",
+                         lambda: generate_with_gtts(text, lang=lang_code)))
 
-        if not audio_data:
+        save_result = None
+        for index, (engine, engine_voice, voice_used, synthesize) in enumerate(attempts):
+            if index:
+                logger.info(f"Falling back to {engine}: {engine_voice}")
+            save_result = tts_cache.get(text, engine, engine_voice)
+            cached = save_result is not None
+            if cached:
+                break
+            audio_data = synthesize()
+            if audio_data:
+                save_result = tts_cache.put(text, engine, engine_voice, audio_data)
+                break
+
+        if not save_result:
             raise Exception("All TTS methods failed")
 
-        extension = "mp3" if selected_voice.get('service') == 'gtts' else "wav"
-        save_result = save_audio_file(audio_data, voice_id, extension)
-        if save_result['status'] != 'success':
-            raise Exception(save_result['message'])
+        # TTS output is usually lip-synced next; cache its 16 kHz PCM and mel now.
+        # Cache hits were prepared when stored, and re-preparing would re-hash them
+        # since get() bumps their mtime
+        if not cached:
+            prepare_lipsync_audio(save_result['filepath'])
 
         response = {
             'status': 'success',
             'audio_url': save_result['audio_url'],
-            'voice_used': selected_voice['name'],
+            'voice_used': voice_used,
             'language': language,
             'service': service,
+            'engine': engine,
+            'cached': cached,
             'voice_metadata': {
                 'style': selected_voice.get('style'),
                 'use_cases': selected_voice.get('use_cases', []),
@@ -890,6 +928,10 @@ def generate_tts():
         logger.error(f"TTS generation error: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/tts-cache', methods=['GET'])
+def tts_cache_stats():
+    return jsonify({'status': 'success', 'cache': tts_cache.stats(), 'coqui_models': get_coqui_pool().stats()})
+
 @app.route('/api/voice-preview/<voice_id>')
 def voice_preview(voice_id):
     try:
@@ -1029,7 +1071,7 @@ def create_video_api():
             }), 400
 
         # Generate secure filenames
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
         audio_filename = f"audio_{timestamp}{Path(audio_file.filename).suffix}"
         media_filename = f"media_{timestamp}{Path(media_file.filename).suffix}"
         
@@ -1043,43 +1085,29 @@ def create_video_api():
         audio_file.save(str(audio_path))
         media_file.save(str(media_path))
 
-        # Process based on media type
         output_dir = Path(app.config['OUTPUT_FOLDER'])
         output_dir.mkdir(exist_ok=True)
         output_filename = f"{'lipsync' if lip_sync else 'video'}_{timestamp}.mp4"
-        output_path = output_dir / output_filename
-
-        # Process with timeout
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(
-                process_media_with_audio,
-                media_path=str(media_path),
-                audio_path=str(audio_path),
-                output_path=str(output_path),
-                lip_sync=lip_sync,
-                is_video=(media_type == 'video')
-            )
-            try:
-                result = future.result(timeout=1800)  # 30 minute timeout
-                if not output_path.exists() or output_path.stat().st_size < 1024:
-                    return jsonify({
-                        'status': 'error',
-                        'message': 'Output video creation failed'
-                    }), 500
-                
-                return jsonify({
-                    'status': 'success',
-                    'video_url': url_for('serve_output', filename=output_filename, _external=True),
-                    'file_size': output_path.stat().st_size,
-                    'duration': get_video_duration(output_path)
-                })
-                
-            except TimeoutError:
-                logger.error("Video generation timed out")
-                return jsonify({
-                    "status": "error",
-                    "message": "Processing took too long"
-                }), 504
+
+        # Queue the render; the worker owns (and removes) the uploads from here on
+        job_id = video_jobs.submit('video', {
+            'media_path': str(media_path.resolve()),
+            'audio_path': str(audio_path.resolve()),
+            'output_path': str((output_dir / output_filename).resolve()),
+            'output_filename': output_filename,
+            'lip_sync': lip_sync,
+            'is_video': media_type == 'video'
+        })
+        audio_path = media_path = None
+        ensure_video_workers()
+        logger.info(f"Queued video job {job_id}")
+
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'status_url': url_for('video_job_status', job_id=job_id, _external=True),
+            'events_url': url_for('video_job_events', job_id=job_id, _external=True)
+        }), 202
 
     except Exception as e:
         logger.error(f"Video generation error: {str(e)}\n{traceback.format_exc()}")
@@ -1089,7 +1117,7 @@ def create_video_api():
         }), 500
         
     finally:
-        # Cleanup
+        # Cleanup uploads of requests that never made it into the queue
         for file_path in [audio_path, media_path]:
             if file_path and file_path.exists():
                 try:
@@ -1097,8 +1125,130 @@ def create_video_api():
                 except Exception as e:
                     logger.warning(f"Could not remove temp file {file_path}: {str(e)}")
 
-def process_media_with_audio(media_path, audio_path, output_path, lip_sync, is_video):
-    """Unified media processing function"""
+def video_job_response(job):
+    """Public view of a queued video job"""
+    response = {
+        'status': 'success',
+        'job_id': job['id'],
+        'job_status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'details': job['details'],
+        'attempts': job['attempts']
+    }
+    if job['status'] == 'queued':
+        response['queue_position'] = video_jobs.position(job['id'])
+    elif job['status'] == 'succeeded':
+        result = job['result']
+        response.update({
+            'video_url': url_for('serve_output', filename=result['output_filename'], _external=True),
+            'file_size': result['file_size'],
+            'duration': result['duration']
+        })
+    elif job['status'] == 'failed':
+        response['message'] = job['error'] if app.debug else 'Video generation failed'
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def video_job_status(job_id):
+    """Status, progress and (once finished) the result of a queued video job"""
+    job = video_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return jsonify(video_job_response(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def video_job_events(job_id):
+    """Server-Sent Events stream of a video job's progress until it finishes.
+
+    Events: 'progress' whenever the job changes, 'stalled' when a running job
+    has reported nothing for VIDEO_JOB_STALL_WARNING seconds, and a final
+    'succeeded' or 'failed'. Comment lines keep idle connections open. The
+    stream closes after VIDEO_JOB_SSE_MAX_SECONDS so it never ties up a worker
+    for a whole render; EventSource reconnects and gets the current state.
+    """
+    if video_jobs.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def events():
+        last_update = None
+        last_sent = started = time.time()
+        stalled_sent = False
+        yield f"retry: {VIDEO_JOB_SSE_RETRY_MS}\n\n"
+        while True:
+            job = video_jobs.get(job_id)
+            now = time.time()
+            if now - started > VIDEO_JOB_SSE_MAX_SECONDS:
+                return
+            if job['status'] in ('succeeded', 'failed'):
+                yield sse(job['status'], video_job_response(job))
+                return
+            if job['updated_at'] != last_update:
+                last_update, last_sent, stalled_sent = job['updated_at'], now, False
+                yield sse('progress', video_job_response(job))
+            elif (job['status'] == 'running' and not stalled_sent
+                  and now - job['updated_at'] > VIDEO_JOB_STALL_WARNING):
+                stalled_sent = True
+                yield sse('stalled', {'job_id': job_id, 'seconds_without_progress': now - job['updated_at']})
+            elif now - last_sent > 10:
+                last_sent = now
+                yield ": keepalive\n\n"
+            time.sleep(0.5)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def describe_progress(event):
+    """Short status line for a lip-sync or ffmpeg progress event"""
+    if event.get('stage') == 'lipsync':
+        message = f"Lip-syncing: {event.get('frames_encoded', 0)}/{event['total_frames']} frames"
+    elif event.get('stage') == 'lipsync_queue':
+        message = f"Waiting for a lip-sync slot ({event['waiting']:.0f}s)"
+    else:
+        message = "Encoding video"
+    if event.get('eta') is not None:
+        message += f", about {event['eta']:.0f}s left"
+    return message
+
+def process_video_job(params, report_progress):
+    """Job queue handler for 'video' jobs: render, check the output and drop the uploads"""
+    try:
+        report_progress(0.0, 'Processing video')
+        # The pool kills this worker after VIDEO_JOB_TIMEOUT; lip-sync gets the same budget so a
+        # shared lip-sync worker stops too instead of rendering for nobody
+        result = process_media_with_audio(
+            media_path=params['media_path'],
+            audio_path=params['audio_path'],
+            output_path=params['output_path'],
+            lip_sync=params['lip_sync'],
+            is_video=params['is_video'],
+            progress=lambda event: report_progress(event['progress'], describe_progress(event), event),
+            timeout=VIDEO_JOB_TIMEOUT
+        )
+        if result and result.get('status') == 'error':
+            return result
+
+        output_path = Path(params['output_path'])
+        if not output_path.exists() or output_path.stat().st_size < 1024:
+            return {'status': 'error', 'message': 'Output video creation failed'}
+        return {
+            'status': 'success',
+            'output_filename': params['output_filename'],
+            'file_size': output_path.stat().st_size,
+            'duration': get_video_duration(output_path)
+        }
+    finally:
+        for file_path in [params['audio_path'], params['media_path']]:
+            try:
+                Path(file_path).unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning(f"Could not remove temp file {file_path}: {str(e)}")
+
+def process_media_with_audio(media_path, audio_path, output_path, lip_sync, is_video, progress=None, timeout=None):
+    """Unified media processing function; progress receives lip-sync / ffmpeg progress events"""
     try:
         if is_video:
             if lip_sync:
@@ -1106,94 +1256,110 @@ def process_media_with_audio(media_path, audio_path, output_path, lip_sync, is_v
                     face_path=media_path,
                     audio_path=audio_path,
                     output_path=output_path,
-                    is_static=False
+                    is_static=False,
+                    progress=progress,
+                    timeout=timeout
                 )
             else:
                 return merge_audio_with_video(
                     video_path=media_path,
                     audio_path=audio_path,
-                    output_path=output_path
+                    output_path=output_path,
+                    progress=progress
                 )
         else:
             if lip_sync:
-                # First convert image to video
-                temp_video = Path(output_path).with_name(f"temp_{Path(output_path).name}")
-                if not create_video_from_image(
-                    image_path=media_path,
-                    audio_path=audio_path,
-                    output_path=str(temp_video)
-                ):
-                    return {'status': 'error', 'message': 'Image to video conversion failed'}
-                
-                # Then apply Wav2Lip
-                result = run_wav2lip(
-                    face_path=str(temp_video),
+                # Wav2Lip's static path reads the image directly; no need to encode it to a video first
+                return run_wav2lip(
+                    face_path=media_path,
                     audio_path=audio_path,
                     output_path=output_path,
-                    is_static=True
+                    is_static=True,
+                    progress=progress,
+                    timeout=timeout
                 )
-                temp_video.unlink(missing_ok=True)
-                return result
             else:
                 return create_video_from_image(
                     image_path=media_path,
                     audio_path=audio_path,
-                    output_path=output_path
+                    output_path=output_path,
+                    progress=progress
                 )
     except Exception as e:
         logger.error(f"Media processing failed: {str(e)}\n{traceback.format_exc()}")
         return {'status': 'error', 'message': str(e)}
 
-def run_wav2lip(face_path, audio_path, output_path, is_static=False):
-    """Run Wav2Lip with proper arguments"""
-    cmd = [
-        "python",
-        "D:\\Suraj Yadav\\ai_video_creator\\ai_app\\Wav2Lip\\inference.py",
-        "--checkpoint_path", "D:\\Suraj Yadav\\ai_video_creator\\ai_app\\models\\wav2lip.pth",
-        "--face", face_path,
-        "--audio", audio_path,
-        "--outfile", output_path,
-        "--resize_factor", "1",
-        "--fps", "25",
-        "--pads", "0", "10", "0", "0",
-        "--nosmooth"
-    ]
-    
-    if is_static:
-        cmd.extend(["--static", "True"])
-    
+def run_wav2lip(face_path, audio_path, output_path, is_static=False, progress=None, timeout=None):
+    """Run Wav2Lip on the shared in-process engine"""
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        return {'status': 'success'}
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Wav2Lip failed: {e.stderr}"
-        logger.error(error_msg)
+        timings = get_lipsync_engine(MODEL_PATH).run(
+            face_path,
+            audio_path,
+            output_path,
+            timeout=timeout,
+            progress=progress,
+            static=is_static,
+            fps=25,
+            resize_factor=1,
+            pads=(0, 10, 0, 0),
+            nosmooth=True
+        )
+        return {'status': 'success', 'timings': timings}
+    except Exception as e:
+        error_msg = f"Wav2Lip failed: {str(e)}"
+        logger.error(f"{error_msg}\n{traceback.format_exc()}")
         return {'status': 'error', 'message': error_msg}
 
-def create_video_from_image(image_path, audio_path, output_path):
+def run_ffmpeg(cmd, duration=None, progress=None):
+    """Run an ffmpeg command, reporting encode progress events parsed from -progress output"""
+    if progress is None or not duration:
+        subprocess.run(cmd, check=True)
+        return
+
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats"] + cmd[1:]
+    start = time.time()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        if key != "out_time_us" or not value.isdigit():
+            continue
+        done = min(1.0, int(value) / 1e6 / duration)
+        elapsed = time.time() - start
+        progress({
+            'stage': 'encode',
+            'progress': done,
+            'elapsed': elapsed,
+            'eta': elapsed * (1 - done) / done if done > 0 else None
+        })
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+
+def create_video_from_image(image_path, audio_path, output_path, progress=None):
     """Convert image to video with audio"""
     try:
+        duration = get_audio_duration(audio_path)
         cmd = [
             "ffmpeg",
             "-loop", "1",
             "-i", image_path,
             "-i", audio_path,
             "-c:v", "libx264",
-            "-t", str(get_audio_duration(audio_path)),
+            "-t", str(duration),
             "-pix_fmt", "yuv420p",
             "-shortest",
             output_path
         ]
-        subprocess.run(cmd, check=True)
+        run_ffmpeg(cmd, duration, progress)
         return {'status': 'success'}
     except subprocess.CalledProcessError as e:
         error_msg = f"Image to video conversion failed: {str(e)}"
         logger.error(error_msg)
         return {'status': 'error', 'message': error_msg}
 
-def merge_audio_with_video(video_path, audio_path, output_path):
+def merge_audio_with_video(video_path, audio_path, output_path, progress=None):
     """Merge audio with existing video"""
     try:
+        duration = min(get_audio_duration(audio_path), get_video_duration(video_path) or float('inf'))
         cmd = [
             "ffmpeg",
             "-i", video_path,
@@ -1205,7 +1371,7 @@ def merge_audio_with_video(video_path, audio_path, output_path):
             "-shortest",
             output_path
         ]
-        subprocess.run(cmd, check=True)
+        run_ffmpeg(cmd, duration, progress)
         return {'status': 'success'}
     except subprocess.CalledProcessError as e:
         error_msg = f"Audio merge failed: {str(e)}"
@@ -1246,5 +1412,7 @@ def serve_output(filename):
     return send_from_directory(app.config['OUTPUT_FOLDER'], filename)
 if __name__ == '__main__':
     download_wav2lip_model()
+    get_coqui_pool().warm_up(coqui_preload_models())
+    ensure_video_workers()
     port = int(os.environ.get('PORT', 5000))  # Use PORT env variable if available, else default to 5000
     app.run(host='0.0.0.0', port=port, threaded=True)
\ No newline at end of file
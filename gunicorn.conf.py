@@ -0,0 +1,8 @@
+# gunicorn.conf.py - picked up automatically by `gunicorn app:app` from the project root
+
+
+def post_worker_init(worker):
+    # TTS runs in the web workers, so Coqui warm-up (COQUI_PRELOAD) happens here;
+    # `python app.py` does the same in its __main__ block
+    import app
+    app.get_coqui_pool().warm_up(app.coqui_preload_models())
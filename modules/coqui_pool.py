@@ -0,0 +1,150 @@
+# modules/coqui_pool.py
+
+import os
+import time
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+COQUI_POOL_MB_ENV = "COQUI_POOL_MB"
+DEFAULT_COQUI_POOL_MB = 2048
+COQUI_PRELOAD_ENV = "COQUI_PRELOAD"
+
+
+def _load_tts(model_name: str):
+    # Imported lazily: the TTS package is heavy and only needed once a Coqui voice is used
+    from TTS.api import TTS
+    return TTS(model_name=f"tts_models/{model_name}", progress_bar=False)
+
+
+def model_bytes(tts) -> int:
+    """Bytes taken by the parameters and buffers of every torch module a TTS instance holds."""
+    synthesizer = getattr(tts, "synthesizer", None)
+    total = 0
+    for module in vars(synthesizer).values() if synthesizer is not None else ():
+        if not hasattr(module, "parameters") or not hasattr(module, "buffers"):
+            continue
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _LoadedModel:
+    def __init__(self, tts, size: int):
+        self.tts = tts
+        self.size = size
+        # Coqui synthesizers keep per-call state, so one model synthesizes one text at a time
+        self.lock = threading.Lock()
+
+
+class CoquiModelPool:
+    """Process-wide registry of loaded Coqui TTS models.
+
+    Models load on first use and stay loaded for later requests. Once the
+    loaded models' weights exceed max_bytes the least recently used ones are
+    dropped, though the model just used is always kept. Concurrent requests
+    for a model that is still loading wait for that load instead of starting
+    their own, and synthesis on each model is serialized.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = int(os.getenv(COQUI_POOL_MB_ENV, DEFAULT_COQUI_POOL_MB)) * 1024 * 1024,
+        loader=_load_tts
+    ):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._models: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, model_name: str) -> _LoadedModel:
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                return self._models[model_name]
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if model_name in self._models:
+                    self._models.move_to_end(model_name)
+                    return self._models[model_name]
+            start = time.perf_counter()
+            tts = self.loader(model_name)
+            model = _LoadedModel(tts, model_bytes(tts))
+            logger.info(f"Loaded Coqui model {model_name} ({model.size / 2**20:.0f} MB) "
+                        f"in {time.perf_counter() - start:.1f}s")
+            with self._lock:
+                self._models[model_name] = model
+                self.loads += 1
+                self._evict()
+            return model
+
+    def _evict(self) -> None:
+        total = sum(model.size for model in self._models.values())
+        while total > self.max_bytes and len(self._models) > 1:
+            name, model = self._models.popitem(last=False)
+            total -= model.size
+            self.evictions += 1
+            logger.info(f"Unloaded Coqui model {name} to stay within {self.max_bytes / 2**20:.0f} MB")
+
+    def synthesize(self, model_name: str, text: str) -> bytes:
+        """Synthesize text with model_name and return the WAV bytes."""
+        model = self.get(model_name)
+        fd, temp_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            with model.lock:
+                model.tts.tts_to_file(text=text, file_path=temp_path)
+            with open(temp_path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(temp_path)
+
+    def warm_up(self, model_names: Iterable[str], background: bool = True) -> Optional[threading.Thread]:
+        """Load model_names ahead of the first request, on a daemon thread unless background is False."""
+        def load_all():
+            for model_name in model_names:
+                try:
+                    self.get(model_name)
+                except Exception as e:
+                    logger.error(f"Coqui warm-up failed for {model_name}: {str(e)}")
+
+        model_names = list(dict.fromkeys(model_names))
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="coqui-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "loaded": list(self._models),
+                "bytes": sum(model.size for model in self._models.values()),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> CoquiModelPool:
+    """Return the process-wide Coqui model pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CoquiModelPool()
+        return _pool
@@ -0,0 +1,395 @@
+# modules/job_queue.py
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import importlib
+import threading
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+JOB_DB_ENV = "VIDEO_JOB_DB"
+DEFAULT_JOB_DB = "temp/video_jobs.sqlite3"
+JOB_WORKERS_ENV = "VIDEO_JOB_WORKERS"
+JOB_TIMEOUT_ENV = "VIDEO_JOB_TIMEOUT"
+DEFAULT_JOB_TIMEOUT = 1800
+# A running job that reports no progress for this long is considered stuck (0 disables)
+JOB_STALL_TIMEOUT_ENV = "VIDEO_JOB_STALL_TIMEOUT"
+DEFAULT_STALL_TIMEOUT = 300
+MAX_ATTEMPTS = 2
+POLL_INTERVAL = 0.5
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    details TEXT,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+"""
+
+
+def _worker_name(pid: Optional[int] = None) -> str:
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Persistent FIFO of background jobs in a local SQLite database.
+
+    Jobs survive restarts of both the web app and the workers: a job is only
+    removed from the queue by a worker atomically claiming it, and a running
+    job whose worker process died is put back (up to MAX_ATTEMPTS runs).
+    Every call opens its own connection, so one JobQueue can be shared by
+    threads, and any number of processes can use the same database file.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = str(db_path or os.getenv(JOB_DB_ENV, DEFAULT_JOB_DB))
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "details" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN details TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["details"] = json.loads(job["details"]) if job["details"] else None
+        return job
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> str:
+        """Queue a job and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def position(self, job_id: str) -> int:
+        """Number of queued jobs ahead of job_id."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < "
+                "(SELECT created_at FROM jobs WHERE id = ?)", (QUEUED, job_id)
+            ).fetchone()
+        return row[0]
+
+    def claim(self, kinds: List[str], worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job of one of kinds to running and return it."""
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT * FROM jobs WHERE status = ? AND kind IN ({placeholders}) "
+                    "ORDER BY created_at LIMIT 1", (QUEUED, *kinds)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, progress = 0, "
+                    "started_at = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, row["id"])
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def set_progress(
+        self,
+        job_id: str,
+        progress: float,
+        message: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Record a running job's 0-1 progress, status message and stage details (e.g. frame counts, ETA)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, message = COALESCE(?, message), "
+                "details = COALESCE(?, details), updated_at = ? WHERE id = ? AND status = ?",
+                (progress, message, json.dumps(details) if details is not None else None,
+                 time.time(), job_id, RUNNING)
+            )
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, result = ?, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND status = ?", (SUCCEEDED, json.dumps(result), now, now, job_id, RUNNING)
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND status IN (?, ?)", (FAILED, error, now, now, job_id, QUEUED, RUNNING)
+            )
+
+    def running(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def requeue_orphans(self, other_hosts: bool = False) -> int:
+        """Put back running jobs whose worker process on this host is gone; return how many.
+
+        With other_hosts, jobs claimed under any other hostname count as
+        orphaned too: after a container restart the hostname changes and
+        their workers are gone with the old container.
+        """
+        host = socket.gethostname()
+        requeued = 0
+        for job in self.running():
+            worker_host, _, pid = (job["worker"] or "").rpartition(":")
+            if worker_host != host:
+                if not other_hosts:
+                    continue
+            elif pid.isdigit() and _pid_alive(int(pid)):
+                continue
+            with self._connect() as conn:
+                if job["attempts"] >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                        (FAILED, "Worker died while processing the job", time.time(), job["id"], RUNNING)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                        (QUEUED, time.time(), job["id"], RUNNING)
+                    )
+                    requeued += 1
+        if requeued:
+            logger.warning(f"Requeued {requeued} job(s) left behind by dead workers")
+        return requeued
+
+
+def _load_handler(spec: str) -> Callable:
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _worker_main(db_path: str, handlers: Dict[str, str], initializer: Optional[str] = None) -> None:
+    """Worker process: claim jobs and run them with the handler registered for their kind.
+
+    A handler is called as handler(params, report_progress), where
+    report_progress(progress, message=None, details=None) updates the job, and
+    returns a result dict; {'status': 'error', 'message': ...} or an exception fails the job.
+    initializer ("module:function") runs once before the first claim, e.g. to load models.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    job_queue = JobQueue(db_path)
+    functions = {kind: _load_handler(spec) for kind, spec in handlers.items()}
+    worker = _worker_name()
+    if initializer:
+        try:
+            _load_handler(initializer)()
+        except Exception as e:
+            logger.error(f"Job worker {worker} initializer {initializer} failed: {str(e)}")
+    logger.info(f"Job worker {worker} ready for {', '.join(functions)}")
+
+    while True:
+        job = job_queue.claim(list(functions), worker)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        logger.info(f"Job {job['id']} ({job['kind']}) started, attempt {job['attempts']}")
+        report = lambda progress, message=None, details=None, job_id=job["id"]: job_queue.set_progress(
+            job_id, progress, message, details
+        )
+        try:
+            result = functions[job["kind"]](job["params"], report) or {}
+            if result.get("status") == "error":
+                job_queue.fail(job["id"], result.get("message", "Job failed"))
+                logger.error(f"Job {job['id']} failed: {result.get('message')}")
+            else:
+                job_queue.complete(job["id"], result)
+                logger.info(f"Job {job['id']} finished")
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}\n{traceback.format_exc()}")
+            job_queue.fail(job["id"], str(e))
+
+
+class JobWorkerPool:
+    """Supervised pool of worker processes consuming a JobQueue.
+
+    Workers are spawned (not forked), so each starts with clean torch and
+    thread state and imports its handlers itself, then runs initializer (if
+    any) before taking jobs. The supervisor thread
+    restarts workers that exit, requeues jobs of dead workers and kills a
+    worker whose job runs past timeout, or reports no progress for
+    stall_timeout seconds, failing that job.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        handlers: Dict[str, str],
+        processes: int = 1,
+        timeout: float = DEFAULT_JOB_TIMEOUT,
+        stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+        initializer: Optional[str] = None
+    ):
+        self.db_path = db_path
+        self.handlers = handlers
+        self.initializer = initializer
+        self.processes = processes
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.queue = JobQueue(db_path)
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: List[multiprocessing.Process] = []
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_worker_main, args=(self.db_path, self.handlers, self.initializer), daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self) -> "JobWorkerPool":
+        self.queue.requeue_orphans(other_hosts=True)
+        self._workers = [self._spawn() for _ in range(self.processes)]
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        logger.info(f"Started {self.processes} job worker(s) on {self.db_path}")
+        return self
+
+    def _kill_overdue(self) -> None:
+        """Fail every running job past timeout or stall_timeout, killing the worker if it is one of ours.
+
+        Jobs of other pools are failed too, so a job whose worker vanished
+        where nobody is left to requeue it still finishes.
+        """
+        workers = {_worker_name(process.pid): process for process in self._workers}
+        now = time.time()
+        for job in self.queue.running():
+            process = workers.get(job["worker"])
+            if now - (job["started_at"] or now) > self.timeout:
+                error = f"Processing took longer than {self.timeout:.0f} seconds"
+            elif self.stall_timeout and now - (job["updated_at"] or now) > self.stall_timeout:
+                error = f"No progress for {self.stall_timeout:.0f} seconds"
+            else:
+                continue
+            self.queue.fail(job["id"], error)
+            if process is None:
+                logger.error(f"Job {job['id']} of worker {job['worker']} failed: {error}")
+                continue
+            logger.error(f"Job {job['id']} failed: {error}; restarting its worker")
+            process.kill()
+
+    def _supervise(self) -> None:
+        while not self._stop.wait(POLL_INTERVAL * 4):
+            self._kill_overdue()
+            for i, process in enumerate(self._workers):
+                if not process.is_alive():
+                    process.join()
+                    logger.warning(f"Job worker {process.pid} exited with {process.exitcode}; restarting")
+                    self._workers[i] = self._spawn()
+            self.queue.requeue_orphans()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for process in self._workers:
+            process.terminate()
+        for process in self._workers:
+            process.join(timeout=10)
+
+    def serve_forever(self) -> None:
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker pool for queued video jobs")
+    parser.add_argument("--db", default=os.getenv(JOB_DB_ENV, DEFAULT_JOB_DB),
+                        help="SQLite job database shared with the web app")
+    parser.add_argument("--workers", type=int, default=int(os.getenv(JOB_WORKERS_ENV, 1) or 1),
+                        help="Number of worker processes")
+    parser.add_argument("--handler", action="append", default=None,
+                        help="kind=module:function to run jobs of a kind with (default: video=app:process_video_job)")
+    parser.add_argument("--init", default=None,
+                        help="module:function each worker runs before taking jobs "
+                             "(default: app:init_video_worker with the default handler)")
+    parser.add_argument("--timeout", type=float, default=float(os.getenv(JOB_TIMEOUT_ENV, DEFAULT_JOB_TIMEOUT)),
+                        help="Seconds before a running job is failed and its worker restarted")
+    parser.add_argument("--stall_timeout", type=float,
+                        default=float(os.getenv(JOB_STALL_TIMEOUT_ENV, DEFAULT_STALL_TIMEOUT)),
+                        help="Seconds without progress before a running job is failed (0 = never)")
+    cli_args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    handlers = dict(spec.split("=", 1) for spec in (cli_args.handler or ["video=app:process_video_job"]))
+    initializer = cli_args.init or (None if cli_args.handler else "app:init_video_worker")
+    JobWorkerPool(
+        cli_args.db, handlers, cli_args.workers, cli_args.timeout, cli_args.stall_timeout, initializer
+    ).serve_forever()
@@ -0,0 +1,384 @@
+# modules/lipsync_engine.py
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import traceback
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+from utils.path_manager import path_manager
+
+logger = logging.getLogger(__name__)
+
+# Constants
+WAV2LIP_DIR = path_manager.get_path("Wav2Lip")
+DEFAULT_CHECKPOINT = "models/wav2lip.pth"
+DEFAULT_PADS = (0, 10, 0, 0)
+WORKER_ADDRESS_ENV = "LIPSYNC_WORKER_ADDRESS"
+WORKER_AUTHKEY_ENV = "LIPSYNC_WORKER_AUTHKEY"
+MAX_JOBS_ENV = "LIPSYNC_MAX_JOBS"
+DETECT_EVERY_ENV = "LIPSYNC_DETECT_EVERY"
+DEFAULT_DETECT_EVERY = int(os.getenv(DETECT_EVERY_ENV, 5))
+MODEL_MODE_ENV = "LIPSYNC_MODEL_MODE"
+# Concurrent jobs share model passes of up to this many frames (0 disables coalescing)
+SCHEDULER_MAX_BATCH_ENV = "LIPSYNC_SCHEDULER_MAX_BATCH"
+SCHEDULER_MAX_WAIT_ENV = "LIPSYNC_SCHEDULER_MAX_WAIT_MS"
+# Seconds between progress events while a job waits for a free slot
+SLOT_WAIT_HEARTBEAT = 30
+
+
+def _add_wav2lip_path() -> None:
+    """Wav2Lip modules import each other by bare name, so their dir must be on sys.path."""
+    wav2lip_dir = str(WAV2LIP_DIR)
+    if wav2lip_dir not in sys.path:
+        sys.path.insert(0, wav2lip_dir)
+
+
+def _import_inference():
+    """Import Wav2Lip/inference.py as a library."""
+    _add_wav2lip_path()
+    import inference
+    return inference
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Turn 'host:port' into a TCP address; anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def _authkey() -> bytes:
+    """Shared secret of the lip-sync worker and its clients; connections exchange pickles."""
+    authkey = os.getenv(WORKER_AUTHKEY_ENV)
+    if not authkey:
+        raise RuntimeError(f"Set {WORKER_AUTHKEY_ENV} to a secret shared by the lip-sync worker and its clients")
+    return authkey.encode()
+
+
+class LipSyncEngine:
+    """Long-lived Wav2Lip runner that keeps the generator and S3FD loaded.
+
+    Spawning inference.py per request pays the torch import, checkpoint
+    deserialization and detector construction every time; this class pays
+    them once and then serves any number of jobs.
+    """
+
+    def __init__(
+        self,
+        checkpoint_path: Union[str, Path] = DEFAULT_CHECKPOINT,
+        max_jobs: Optional[int] = None
+    ):
+        self.checkpoint_path = path_manager.resolve_path(checkpoint_path)
+        self.pipeline = None
+        self.load_time = None
+        self._inference = None
+        self._load_lock = threading.Lock()
+        # Each job gets its own workspace, so the only limit is CPU/RAM
+        self.max_jobs = max_jobs or int(os.getenv(MAX_JOBS_ENV, max(1, (os.cpu_count() or 1) // 4)))
+        self._job_slots = threading.BoundedSemaphore(self.max_jobs)
+
+    @property
+    def loaded(self) -> bool:
+        return self.pipeline is not None
+
+    def load(self) -> "LipSyncEngine":
+        """Load the Wav2Lip checkpoint and face detector if not done already."""
+        with self._load_lock:
+            if self.loaded:
+                return self
+            start = time.perf_counter()
+            inference = _import_inference()
+            config = inference.PipelineConfig(
+                checkpoint_path=str(self.checkpoint_path),
+                model_mode=os.getenv(MODEL_MODE_ENV, "fused"),
+                scheduler_max_batch=int(os.getenv(SCHEDULER_MAX_BATCH_ENV, 128)),
+                scheduler_max_wait_ms=float(os.getenv(SCHEDULER_MAX_WAIT_ENV, 10))
+            )
+            logger.info(f"Loading Wav2Lip engine on {config.device}: {self.checkpoint_path}")
+            self.pipeline = inference.Wav2LipPipeline(config).load()
+            self._inference = inference
+            self.load_time = time.perf_counter() - start
+            logger.info(f"Wav2Lip engine ready in {self.load_time:.2f}s")
+        return self
+
+    def build_job(
+        self,
+        face_path: Union[str, Path],
+        audio_path: Union[str, Path],
+        output_path: Union[str, Path],
+        static: bool = False,
+        fps: float = 25,
+        resize_factor: int = 1,
+        pads: Sequence[int] = DEFAULT_PADS,
+        nosmooth: bool = True,
+        detect_every: int = DEFAULT_DETECT_EVERY
+    ):
+        """Describe one request as an inference.JobConfig."""
+        return self._inference.JobConfig(
+            face=str(face_path),
+            audio=str(audio_path),
+            outfile=str(output_path),
+            static=static,
+            fps=fps,
+            resize_factor=resize_factor,
+            pads=tuple(pads),
+            nosmooth=nosmooth,
+            detect_every=detect_every
+        )
+
+    def run(
+        self,
+        face_path: Union[str, Path],
+        audio_path: Union[str, Path],
+        output_path: Union[str, Path],
+        timeout: Optional[float] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        **options
+    ) -> Dict[str, float]:
+        """Lip-sync face_path to audio_path and return per-stage timings in seconds.
+
+        Keys ending in "_utilization" are instead the fraction of the job's
+        wall-clock time that pipeline stage was busy. progress, if given, is
+        called with the pipeline's progress events (see stages.ProgressReporter).
+
+        With timeout, TimeoutError is raised once timeout seconds (queueing
+        included) have passed. The job itself stops at its next encoded frame
+        and only then frees its slot. Setting cancel stops it the same way.
+        """
+        self.load()
+        job = self.build_job(face_path, audio_path, output_path, **options)
+        if timeout is None:
+            return self._run(job, progress, cancel=cancel)
+
+        deadline = time.monotonic() + timeout
+        outcome = {}
+        def run_job():
+            try:
+                outcome["timings"] = self._run(job, progress, deadline, cancel)
+            except BaseException as e:
+                outcome["error"] = e
+        worker = threading.Thread(target=run_job, name="lipsync-job", daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            raise TimeoutError(f"Lip-sync job did not finish within {timeout} seconds")
+        if "error" in outcome:
+            # Pop it so the traceback -> frame -> outcome cycle does not keep the job's state alive
+            error = outcome.pop("error")
+            try:
+                raise error
+            finally:
+                del error
+        return outcome["timings"]
+
+    def _acquire_slot(self, progress=None, deadline: Optional[float] = None,
+                      cancel: Optional[threading.Event] = None) -> None:
+        """Wait for a job slot, sending a 'lipsync_queue' progress event every SLOT_WAIT_HEARTBEAT seconds."""
+        queued_at = time.monotonic()
+        while True:
+            wait = SLOT_WAIT_HEARTBEAT
+            if deadline is not None:
+                wait = min(wait, max(0, deadline - time.monotonic()))
+            if self._job_slots.acquire(timeout=wait):
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Lip-sync job timed out waiting for a free slot")
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError("Lip-sync job was cancelled while waiting for a free slot")
+            if progress is not None:
+                progress({"stage": "lipsync_queue", "progress": 0.0, "eta": None,
+                          "waiting": time.monotonic() - queued_at})
+
+    def _run(
+        self,
+        job,
+        progress=None,
+        deadline: Optional[float] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Dict[str, float]:
+        queued_at = time.perf_counter()
+        self._acquire_slot(progress, deadline, cancel)
+        try:
+            queue_wait = time.perf_counter() - queued_at
+            timings = self.pipeline.run(job, progress=progress, deadline=deadline, cancel=cancel)
+        finally:
+            self._job_slots.release()
+        timings["queue_wait"] = queue_wait
+        logger.info(
+            "Lip-sync timings: " + ", ".join(
+                f"{k}={v:.0%}" if k.endswith("_utilization") else f"{k}={v:.2f}s"
+                for k, v in timings.items()
+            )
+        )
+        return timings
+
+
+class LipSyncClient:
+    """Submit jobs to a LipSyncEngine running in a worker process (see serve())."""
+
+    def __init__(self, address: str):
+        self.address = parse_address(address)
+
+    def load(self, timeout: float = 600) -> "LipSyncClient":
+        """Wait until the worker accepts connections (it listens once its model is loaded)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                Client(self.address, authkey=_authkey()).close()
+                return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(1)
+
+    def run(
+        self,
+        face_path: Union[str, Path],
+        audio_path: Union[str, Path],
+        output_path: Union[str, Path],
+        timeout: Optional[float] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **options
+    ) -> Dict[str, float]:
+        job = {
+            "face_path": str(face_path),
+            "audio_path": str(audio_path),
+            "output_path": str(output_path),
+            "options": options,
+            "progress": progress is not None,
+            "timeout": timeout,
+        }
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with Client(self.address, authkey=_authkey()) as conn:
+            conn.send(job)
+            while True:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                if not conn.poll(remaining):
+                    raise TimeoutError(f"Lip-sync worker did not answer within {timeout} seconds")
+                reply = conn.recv()
+                if reply["status"] != "progress":
+                    break
+                progress(reply["event"])
+        if reply["status"] != "success":
+            raise RuntimeError(reply["message"])
+        return reply["timings"]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(checkpoint_path: Union[str, Path] = DEFAULT_CHECKPOINT):
+    """Return the process-wide engine, or a worker client if LIPSYNC_WORKER_ADDRESS is set."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            address = os.getenv(WORKER_ADDRESS_ENV)
+            if address:
+                logger.info(f"Using lip-sync worker at {address}")
+                _engine = LipSyncClient(address)
+            else:
+                _engine = LipSyncEngine(checkpoint_path)
+        return _engine
+
+
+_mel_cache = None
+
+
+def prepare_audio(audio_path: Union[str, Path]) -> bool:
+    """Precompute the Wav2Lip audio front-end (16 kHz PCM + mel) for audio_path.
+
+    Meant to run right after TTS: the cache is content-addressed and shared
+    with the lip-sync pipeline, so a later job on the same audio skips the
+    conversion and STFT. Failures are only logged; lip-sync redoes the work.
+    """
+    global _mel_cache
+    try:
+        with _engine_lock:
+            if _mel_cache is None:
+                _add_wav2lip_path()
+                import mel_cache
+                _mel_cache = mel_cache.MelCache()
+        start = time.perf_counter()
+        _, mel = _mel_cache.prepare(str(audio_path))
+        logger.info(f"Cached {mel.shape[1]} mel frames for {audio_path} in {time.perf_counter() - start:.2f}s")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not precompute mel spectrogram for {audio_path}: {str(e)}")
+        return False
+
+
+def _watch_client(conn, cancel: threading.Event, done: threading.Event) -> None:
+    """Set cancel once the client hangs up; it sends nothing after the job, so any readable end means EOF."""
+    while not done.is_set() and not cancel.is_set():
+        try:
+            if conn.poll(1):
+                conn.recv()
+        except (EOFError, OSError):
+            cancel.set()
+
+
+def _handle_connection(engine: LipSyncEngine, conn) -> None:
+    with conn:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+
+        # A client that goes away (e.g. its job worker was killed) cancels its job
+        cancel, done = threading.Event(), threading.Event()
+        threading.Thread(target=_watch_client, args=(conn, cancel, done), daemon=True).start()
+        # Progress events are sent ahead of the final reply on the same connection
+        send_lock = threading.Lock()
+        def send(message):
+            with send_lock:
+                try:
+                    conn.send(message)
+                except OSError:
+                    cancel.set()
+        try:
+            timings = engine.run(
+                job["face_path"], job["audio_path"], job["output_path"],
+                timeout=job.get("timeout"),
+                progress=(lambda event: send({"status": "progress", "event": event})) if job.get("progress") else None,
+                cancel=cancel,
+                **job.get("options", {})
+            )
+            send({"status": "success", "timings": timings})
+        except Exception as e:
+            if cancel.is_set():
+                logger.warning(f"Lip-sync job for {job['output_path']} stopped: its client disconnected")
+            else:
+                logger.error(f"Lip-sync job failed: {str(e)}\n{traceback.format_exc()}")
+                send({"status": "error", "message": str(e)})
+        finally:
+            done.set()
+
+
+def serve(address: str, checkpoint_path: Union[str, Path] = DEFAULT_CHECKPOINT) -> None:
+    """Load the engine once and serve jobs on a local socket until interrupted."""
+    authkey = _authkey()
+    engine = LipSyncEngine(checkpoint_path).load()
+    with Listener(parse_address(address), authkey=authkey) as listener:
+        logger.info(f"Lip-sync worker listening on {address}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle_connection, args=(engine, conn), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent Wav2Lip lip-sync worker")
+    parser.add_argument("--address", default=os.getenv(WORKER_ADDRESS_ENV, "127.0.0.1:6010"),
+                        help="host:port or Unix socket path to listen on")
+    parser.add_argument("--checkpoint_path", default=DEFAULT_CHECKPOINT)
+    cli_args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    serve(cli_args.address, cli_args.checkpoint_path)
@@ -0,0 +1,140 @@
+# modules/tts_cache.py
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+from functools import lru_cache
+from importlib import metadata
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+TTS_CACHE_DIR = "static/audio/cache"
+TTS_CACHE_URL = "/static/audio/cache"
+TTS_CACHE_MB_ENV = "TTS_CACHE_MB"
+DEFAULT_TTS_CACHE_MB = 1024
+
+# Container each engine returns its audio in
+ENGINE_EXTENSIONS = {"edge": "mp3", "coqui": "wav", "gtts": "mp3"}
+ENGINE_PACKAGES = {"edge": "edge-tts", "coqui": "TTS", "gtts": "gTTS"}
+
+# Bump when the key derivation or text normalization changes
+CACHE_VERSION = "tts-1"
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with whitespace runs collapsed, so trivially different scripts share an entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+@lru_cache(maxsize=None)
+def engine_version(engine: str) -> str:
+    """Installed version of an engine's package; upgrades invalidate its entries."""
+    try:
+        return metadata.version(ENGINE_PACKAGES[engine])
+    except (KeyError, metadata.PackageNotFoundError):
+        return "unknown"
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized speech.
+
+    Entries are keyed on the normalized text, voice, engine and engine
+    version and stored as <key>.<ext> under root, which is served as static
+    files, so a hit is answered with a URL without touching the engine.
+    Files are trimmed least recently used first once the directory grows
+    past max_bytes. hits/misses count lookups made by this process.
+    """
+
+    def __init__(
+        self,
+        root: str = TTS_CACHE_DIR,
+        url_prefix: str = TTS_CACHE_URL,
+        max_bytes: int = int(os.getenv(TTS_CACHE_MB_ENV, DEFAULT_TTS_CACHE_MB)) * 1024 * 1024
+    ):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, text: str, engine: str, voice: str) -> str:
+        parts = [CACHE_VERSION, engine, engine_version(engine), voice, normalize_text(text)]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _entry(self, key: str, engine: str) -> Dict[str, str]:
+        filename = f"{key}.{ENGINE_EXTENSIONS[engine]}"
+        return {
+            "filepath": os.path.join(self.root, filename),
+            "audio_url": f"{self.url_prefix}/{filename}",
+        }
+
+    def get(self, text: str, engine: str, voice: str) -> Optional[Dict[str, str]]:
+        """Return {'filepath', 'audio_url'} of the cached speech, or None."""
+        entry = self._entry(self.key(text, engine, voice), engine)
+        try:
+            os.utime(entry["filepath"])
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, text: str, engine: str, voice: str, audio_data: bytes) -> Dict[str, str]:
+        """Store synthesized speech and return its {'filepath', 'audio_url'}."""
+        entry = self._entry(self.key(text, engine, voice), engine)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio_data)
+            os.replace(tmp, entry["filepath"])
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+        return entry
+
+    def _files(self):
+        for name in os.listdir(self.root):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            yield name, stat
+
+    def evict(self) -> None:
+        """Delete least recently used files until the cache fits in max_bytes."""
+        files = sorted(self._files(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in files)
+        for name, stat in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                continue
+            total -= stat.st_size
+            logger.debug(f"Evicted TTS cache entry {name}")
+
+    def stats(self) -> Dict[str, float]:
+        files = list(self._files())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(files),
+            "bytes": sum(stat.st_size for _, stat in files),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,17 @@
+#!/bin/bash
+set -e
+
+# One container runs the lip-sync worker (Wav2Lip loaded once, batches of
+# concurrent jobs coalesced), the video job workers feeding it and the web app.
+# They share the disk, so uploads, outputs and the job database stay local.
+export LIPSYNC_WORKER_ADDRESS="${LIPSYNC_WORKER_ADDRESS:-127.0.0.1:6010}"
+export LIPSYNC_WORKER_AUTHKEY="${LIPSYNC_WORKER_AUTHKEY:-$(python -c 'import secrets; print(secrets.token_hex(16))')}"
+
+# One job worker per lip-sync slot: extra workers would only queue for a slot
+export LIPSYNC_MAX_JOBS="${LIPSYNC_MAX_JOBS:-$(python -c 'import os; print(max(1, (os.cpu_count() or 1) // 4))')}"
+
+python -m modules.lipsync_engine --address "$LIPSYNC_WORKER_ADDRESS" &
+python -m modules.job_queue --workers "${VIDEO_JOB_WORKERS:-$LIPSYNC_MAX_JOBS}" &
+
+# Jobs run in the processes above, not inside the web workers
+VIDEO_JOB_WORKERS=0 exec gunicorn app:app --worker-class gthread --threads 8